@@ -0,0 +1,398 @@
+"""
+gibbsSampler.py
+
+Description: The Gibbs Sampler motif finder as an importable module.
+    Sequences are read from any FASTA path or iterable of lines and
+    encoded once, after which any number of motif searches (different
+    motif lengths, convergence criteria or seeds) can be run on them
+    in the same process. gibbsSampler-i.py is the command line
+    front end of this module.
+"""
+
+import random
+from multiprocessing import Pool
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# fastaRecords
+# Purpose: streams the sequences of a FASTA formatted input, joining
+#          the lines of each record once instead of concatenating them
+#          one by one
+# Parameters: lines is any iterable of lines, e.g. sys.stdin or an
+#             opened file
+# Returns: a generator yielding every non-empty sequence in order
+def fastaRecords(lines):
+    chunks = []
+    for line in lines:
+        if line[0:1] == '>':
+            if len(chunks) > 0:
+                yield "".join(chunks)
+                chunks = []
+        else:
+            line = line.rstrip("\r\n")
+            if line != "":
+                chunks.append(line)
+    if len(chunks) > 0:
+        yield "".join(chunks)
+
+
+# readFasta
+# Purpose: reads all sequences of a FASTA formatted input
+# Parameters: source is a file name or any iterable of lines
+# Returns: a list of the sequences
+def readFasta(source):
+    if isinstance(source, str):
+        with open(source, "r") as fstream:
+            return list(fastaRecords(fstream))
+    return list(fastaRecords(source))
+
+
+# initPositions
+# Purpose: Initializes random positions for the motif position
+#          list, drawn from rng (the random module by default)
+def initPositions(numSeqs, motifLen, posArray, sequences, rng=random):
+    for i in range(numSeqs):
+        randindex = rng.randint(0, len(sequences[i]) - motifLen)
+        posArray.append(randindex)
+
+
+# encodeDNA
+# Purpose: encodes ATCG to 0123
+def encodeDNA(letter):
+    if letter == 'A':
+        return 0
+    elif letter == 'T':
+        return 1
+    elif letter == 'C':
+        return 2
+    else: # letter = 'G'
+        return 3
+
+
+# Lookup table applying encodeDNA to every byte value at once
+dnaCodes = np.full(256, 3, dtype=np.uint8)
+for letter in "ATC":
+    dnaCodes[ord(letter)] = encodeDNA(letter)
+
+
+# encodeSeqs
+# Purpose: encodes all sequences once into a matrix of 0123 codes
+# Parameters: sequences is the list of all complete sequences
+# Returns: a numSeqs x (longest length) uint8 matrix with one row per
+#          sequence, padded with zeros after its end
+def encodeSeqs(sequences):
+    codes = np.zeros((len(sequences), max(len(seq) for seq in sequences)),
+                     dtype=np.uint8)
+    for i in range(len(sequences)):
+        letters = np.frombuffer(sequences[i].encode("ascii"), dtype=np.uint8)
+        codes[i, :len(letters)] = dnaCodes[letters]
+    return codes
+
+
+# countMotifs
+# Purpose: counts the letters at every position of the current motifs
+# Parameters: seqCodes is the matrix of all encoded sequences
+#             motifPos is the array of motif positions (integers) of
+#             each sequence
+#             motifLength is the length of the motifs
+# Returns: a 4 x motifLength integer matrix (A, T, C, G rows) of counts
+def countMotifs(seqCodes, motifPos, motifLength):
+    cols = np.arange(motifLength)
+    motifs = seqCodes[np.arange(len(seqCodes))[:, None], motifPos[:, None] + cols]
+    return np.bincount((motifs * motifLength + cols).ravel(),
+                       minlength=4 * motifLength).reshape(4, motifLength)
+
+
+# updateCounts
+# Purpose: adds (delta = 1) or removes (delta = -1) the motif of one
+#          sequence to or from the count matrix, in O(motifLength)
+# Parameters: counts is the count matrix to be updated in place
+#             seqCodes is the encoded sequence
+#             pos is the position of its motif
+#             delta is +1 or -1
+def updateCounts(counts, seqCodes, pos, delta):
+    motifLength = counts.shape[1]
+    counts[seqCodes[pos:pos + motifLength], np.arange(motifLength)] += delta
+
+
+# buildPSSM
+# Purpose: to build a position specific substitution matrix
+#          for a specific iteration from the counts of the motifs of
+#          all sequences but s*
+# Parameters: counts is the count matrix of the motifs of every
+#             sequence except the s* of this iteration
+#             numSeqs is the number of sequences, s* included
+#             pseudoCount is the pseudo count added to every entry
+# Returns: a 4 x motifLength PSSM matrix (A, T, C, G rows) based on
+#          the current motif sequences
+def buildPSSM(counts, numSeqs, pseudoCount):
+    # real counts, plus the pseudo count
+    currMtx = counts + float(pseudoCount)
+
+    # divide by the total count of each column to calculate the freq
+    # and then divide by 0.25 to get the odds ratio
+    currMtx /= ((numSeqs - 1) + 4 * pseudoCount)
+    currMtx /= 0.25
+
+    # round like the built-in round() does, which np.round does not
+    # always match; the matrix only has 4 x motifLength entries
+    return np.array([[round(x, 3) for x in row] for row in currMtx.tolist()])
+
+
+# windowScores
+# Purpose: scores every window of a sequence against a PSSM
+# Parameters: starCodes is the encoded sequence
+#             pssmMtx is the PSSM matrix calculated for
+#             this iteration
+# Returns: a float array of the log odds (sum of the log odds ratios)
+#          of the windows starting at 0 .. len(starCodes) - motifLength
+# Note: every window is scored at once as a sum of log odds ratios
+#       over a sliding-window view of the sequence, which ranks the
+#       windows the same way as the product of the odds ratios. The
+#       sums are rounded so that windows with the same odds ratios in
+#       a different order tie.
+def windowScores(starCodes, pssmMtx):
+    motifLength = pssmMtx.shape[1]
+    with np.errstate(divide="ignore"):
+        logMtx = np.log(pssmMtx)
+    windows = sliding_window_view(starCodes, motifLength)
+    return np.round(logMtx[windows, np.arange(motifLength)].sum(axis=1), 9)
+
+
+# bestIdxStar
+# Purpose: given the PSSM matrix and a sequence, it returns
+#          a position index that produces the best motif
+#          sequence within the complete sequence based
+#          on the PSSM.
+# Parameters: starCodes is the encoded sequence to be updated with
+#             its motif index
+#             pssmMtx is the PSSM matrix calculated for
+#             this iteration
+# Returns: an integer representing the best-motif index in
+#          starSeq (the first one on ties)
+def bestIdxStar(starCodes, pssmMtx):
+    return int(np.argmax(windowScores(starCodes, pssmMtx)))
+
+
+# sampleIdxStar
+# Purpose: draws a motif position of a sequence with a probability
+#          proportional to the PSSM likelihood of its window
+# Parameters: starCodes is the encoded sequence to be updated with
+#             its motif index
+#             pssmMtx is the PSSM matrix calculated for
+#             this iteration
+#             rng is the source of random numbers
+# Returns: the drawn motif index in starSeq
+# Note: a single uniform number is located in the cumulative sum of
+#       the likelihoods, so a draw costs a few array operations
+def sampleIdxStar(starCodes, pssmMtx, rng=random):
+    scores = windowScores(starCodes, pssmMtx)
+    if not np.isfinite(scores.max()):
+        return rng.randint(0, len(scores) - 1)
+    cumLikelihood = np.cumsum(np.exp(scores - scores.max()))
+    idx = np.searchsorted(cumLikelihood, rng.random() * cumLikelihood[-1], side="right")
+    return int(min(idx, len(scores) - 1))
+
+
+# informationContent
+# Purpose: scores a set of motifs by its total information content,
+#          i.e. the log-likelihood ratio (in bits) of the motif
+#          frequencies against a uniform background, summed over
+#          the motif positions
+# Parameters: counts is the count matrix of the motifs of all sequences
+#             numSeqs is the number of sequences
+#             pseudoCount is the pseudo count added to every entry
+# Returns: the information content as a float
+def informationContent(counts, numSeqs, pseudoCount):
+    freqs = (counts + pseudoCount) / (numSeqs + 4 * pseudoCount)
+    return float((freqs * np.log2(freqs / 0.25)).sum())
+
+
+# Motif finder of a worker process of runChains, set by initChainWorker
+workerFinder = None
+
+# initChainWorker
+# Purpose: sets up a worker process of runChains with the motif finder
+#          of the main process, shipped once per worker
+def initChainWorker(finder):
+    global workerFinder
+    workerFinder = finder
+
+
+# chainWorker
+# Purpose: runs one seeded chain inside a worker process
+# Parameters: task is the (seed, motifLength, conv, sample) tuple of
+#             the chain
+# Returns: (seed, motif positions, number of iterations, information
+#          content of the motifs)
+def chainWorker(task):
+    seed, motifLength, conv, sample = task
+    motifPos, numItn = workerFinder.runChain(motifLength, conv, random.Random(seed),
+                                             sample)
+    return seed, motifPos, numItn, workerFinder.score(motifPos, motifLength)
+
+
+# Class definition of a Gibbs Sampler motif finder over a fixed set of
+# sequences, with the improved convergence criterion that ends whenever
+# there are no updates on motif positions of s* for k consecutive
+# iterations
+class gibbsMotifFinder:
+    # Parameters: sequences is a list of DNA sequence strings
+    #             pseudoCount is the pseudo count of the PSSMs
+    def __init__(self, sequences, pseudoCount=1):
+        self.seqs = list(sequences)
+        self.seqCodes = encodeSeqs(self.seqs)
+        self.seqLens = [len(seq) for seq in self.seqs]
+        self.pseudoCount = pseudoCount
+
+    # Method for creating a motif finder from FASTA input
+    # Parameters: source is a file name or any iterable of lines
+    #             pseudoCount is the pseudo count of the PSSMs
+    # Returns: a new gibbsMotifFinder
+    @classmethod
+    def fromFasta(cls, source, pseudoCount=1):
+        return cls(readFasta(source), pseudoCount)
+
+    # Method for running one chain of the Gibbs sampler
+    # Parameters: motifLength is the length of the motifs
+    #             conv is the number of consecutive iterations without
+    #             an update of s* (greedy) or without a better motif
+    #             set (sampling) that ends the chain
+    #             rng is the source of random numbers (the random
+    #             module by default, or a seeded random.Random)
+    #             sample draws the position of s* in proportion to the
+    #             PSSM likelihoods instead of taking the best one
+    #             initPos are optional initial motif positions, random
+    #             ones are drawn by default
+    # Returns: the array of motif positions and the number of iterations;
+    #          when sampling, the positions of the motif set with the
+    #          highest information content visited by the chain
+    def runChain(self, motifLength=6, conv=20, rng=random, sample=False,
+                 initPos=None):
+        numSeqs = len(self.seqs)
+        motifPos = []
+        if initPos is None:
+            initPositions(numSeqs, motifLength, motifPos, self.seqs, rng)
+        else:
+            motifPos = initPos
+
+        # Keep the motif positions in an array and count the letters of
+        # all motifs; the counts are then updated as s* is taken out and
+        # put back in, instead of being rebuilt
+        motifPos = np.array(motifPos)
+        counts = countMotifs(self.seqCodes, motifPos, motifLength)
+        bestScore = informationContent(counts, numSeqs, self.pseudoCount)
+        bestPos = motifPos.copy()
+
+        # Pick the initial s*, initialize the iteration count and
+        # consecutive no-update count
+        sstarIdx = rng.randint(0, numSeqs - 1)
+        numItn = 0
+        endNum = 0
+
+        # Start the iteration loop, and end when there are no updates
+        # for [conv] consecutive iterations
+        while endNum < conv:
+            numItn += 1
+            starCodes = self.seqCodes[sstarIdx, :self.seqLens[sstarIdx]]
+            updateCounts(counts, starCodes, motifPos[sstarIdx], -1)
+            mx = buildPSSM(counts, numSeqs, self.pseudoCount)
+            if sample:
+                iStar = sampleIdxStar(starCodes, mx, rng)
+            else:
+                iStar = bestIdxStar(starCodes, mx)
+            updateCounts(counts, starCodes, iStar, 1)
+
+            if sample:
+                # a sampled chain keeps moving, so it ends once the best
+                # motif set visited has not improved for [conv] iterations
+                motifPos[sstarIdx] = iStar
+                score = informationContent(counts, numSeqs, self.pseudoCount)
+                if score > bestScore:
+                    bestScore = score
+                    bestPos = motifPos.copy()
+                    endNum = 0
+                else:
+                    endNum += 1
+            elif (iStar == motifPos[sstarIdx]):
+                endNum += 1
+            else:
+                endNum = 0
+                motifPos[sstarIdx] = iStar
+            nextIdx = rng.randint(0, numSeqs - 1)
+            while nextIdx == sstarIdx:
+                nextIdx = rng.randint(0, numSeqs - 1)
+            sstarIdx = nextIdx
+
+        if sample:
+            return bestPos, numItn
+        return motifPos, numItn
+
+    # Method for running independent seeded chains across a process pool
+    # Parameters: motifLength, conv and sample are passed on to runChain
+    #             numChains is the number of chains, seeded with
+    #             baseSeed, baseSeed + 1, ...
+    #             numWorkers is the size of the pool (all cores by default)
+    # Returns: the list of chainWorker results in chain order, and the
+    #          index of the chain with the highest information content
+    #          (the first one on ties)
+    def runChains(self, motifLength=6, conv=20, numChains=1, baseSeed=0,
+                  numWorkers=None, sample=False):
+        tasks = [(baseSeed + k, motifLength, conv, sample) for k in range(numChains)]
+        with Pool(numWorkers, initChainWorker, (self,)) as pool:
+            results = pool.map(chainWorker, tasks)
+        bestChain = 0
+        for k in range(numChains):
+            if results[k][3] > results[bestChain][3]:
+                bestChain = k
+        return results, bestChain
+
+    # Method for searching motifs of several lengths on the same
+    # encoded sequences
+    # Parameters: motifLengths is the list of motif lengths to try
+    #             conv and sample are passed on to runChain
+    #             numChains, baseSeed and numWorkers are passed on to
+    #             runChains when more than one chain is wanted per length
+    #             rng is the source of random numbers of single chains
+    # Returns: a list of (motifLength, motif positions, number of
+    #          iterations, information content) in increasing length
+    # Note: with one chain per length, every chain starts from the
+    #       motifs of the previous length (kept inside the sequences),
+    #       which are already close to a good motif set
+    def searchLengths(self, motifLengths, conv=20, sample=False, rng=random,
+                      numChains=1, baseSeed=0, numWorkers=None):
+        results = []
+        prevPos = None
+        for motifLength in sorted(motifLengths):
+            if numChains > 1:
+                chains, bestChain = self.runChains(motifLength, conv, numChains,
+                                                   baseSeed, numWorkers, sample)
+                _, motifPos, numItn, score = chains[bestChain]
+            else:
+                initPos = None
+                if prevPos is not None:
+                    initPos = [min(prevPos[i], self.seqLens[i] - motifLength)
+                               for i in range(len(self.seqs))]
+                motifPos, numItn = self.runChain(motifLength, conv, rng, sample,
+                                                 initPos)
+                score = self.score(motifPos, motifLength)
+            results.append((motifLength, motifPos, numItn, score))
+            prevPos = motifPos
+        return results
+
+    # Method for scoring a set of motifs by its information content
+    # Parameters: motifPos is the array of motif positions
+    #             motifLength is the length of the motifs
+    # Returns: the information content in bits
+    def score(self, motifPos, motifLength):
+        counts = countMotifs(self.seqCodes, motifPos, motifLength)
+        return informationContent(counts, len(self.seqs), self.pseudoCount)
+
+    # Method for reading the motifs off the sequences
+    # Parameters: motifPos is the array of motif positions
+    #             motifLength is the length of the motifs
+    # Returns: a list of the motif strings
+    def motifs(self, motifPos, motifLength):
+        return [self.seqs[i][motifPos[i]:motifPos[i] + motifLength]
+                for i in range(len(self.seqs))]
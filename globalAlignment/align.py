@@ -6,12 +6,27 @@ Purpose: Implementation of the global alignment algorithm
 with a naive scoring function and a linear gap genalty.
 '''
 import sys
+from alignEngine import nwAlign, nwScore, hirschbergAlign, bandedAlign, \
+    gotohAlign, gotohScore, scoreTable, readSubMatrix
+
+# Default values for M, m and g are set as follows
+defaultMatch = 4
+defaultMismatch = -2
+defaultGap = -2
+
+# The alignment engines: "numpy" fills the matrix row by row
+# with NumPy, "score" only computes the alignment score using O(n)
+# memory, "hirschberg" computes the same alignment using O(m+n) memory,
+# "banded" only fills the cells near the main diagonal and "naive" runs
+# the original cell-by-cell implementation
+modes = ["numpy", "score", "hirschberg", "banded", "naive"]
 
 # score
 # Purpose: compare two letters and return their similarity score
-# Parameters: p and q are two letters to be comapred
+# Parameters: p and q are two letters to be comapred, match and
+#             mismatch are the scores of matching and mismatching
 # Returns: the similarity score in integer of the two letters
-def score(p,q):
+def score(p, q, match, mismatch):
     if p == q:
         return match
     else:
@@ -20,11 +35,12 @@ def score(p,q):
 # fillMatrix
 # Purpose: fill in the row th row, col th column element of the matrix, and record
 #          the corresponding traceback for that element in a traceBack matrix
-# Parameters: the indices indicating the element to be filled in row and col
-# Returns: N/A
-# Note: requires the alignMatrix and traceBackMatrix to be defined
-def fillMatrix(row, col):
-    diag = alignMatrix[row - 1][col - 1] + score(s1[row - 1], s2[col - 1])
+# Parameters: alignMatrix and traceBackMatrix are the matrices being filled,
+#             s1 and s2 are the sequences, the indices indicating the element
+#             to be filled in row and col, and the match, mismatch and gap scores
+# Returns: the score of the element
+def fillMatrix(alignMatrix, traceBackMatrix, s1, s2, row, col, match, mismatch, gap):
+    diag = alignMatrix[row - 1][col - 1] + score(s1[row - 1], s2[col - 1], match, mismatch)
     vertGap = alignMatrix[row - 1][col] + gap
     horiGap = alignMatrix[row][col - 1] + gap 
     rtnval = max(diag, vertGap, horiGap)
@@ -42,34 +58,37 @@ def fillMatrix(row, col):
 # Purpose: fill in the alignment matrix with the initialization of the top row and
 #          the leftmost column to be zeros and fill in the traceback matrix according
 #          to the alignment matrix
-# Parameters: N/A
-# Returns: N/A
-# Note: requires the alignMatrix and traceBackMatrix to be defined
-def fillAllMatrices():
-    for i in range(m+1):
+# Parameters: s1 and s2 are the sequences, match, mismatch and gap are the scores
+# Returns: the alignment matrix and the traceback matrix
+def fillAllMatrices(s1, s2, match, mismatch, gap):
+    alignMatrix = []
+    traceBackMatrix = []
+    for i in range(len(s1)+1):
         alignMatrix.append([])
         traceBackMatrix.append([])
         if i == 0:
-            for j in range(n+1):
+            for j in range(len(s2)+1):
                 alignMatrix[i].append(gap * j)
                 traceBackMatrix[i].append(2)
         else:
-            for j in range(n+1):
+            for j in range(len(s2)+1):
                 if j == 0:
                     alignMatrix[i].append(gap * i)
                     traceBackMatrix[i].append(1)
                 else:
-                    alignMatrix[i].append(fillMatrix(i,j))
+                    alignMatrix[i].append(fillMatrix(alignMatrix, traceBackMatrix,
+                                                     s1, s2, i, j, match, mismatch, gap))
+    return alignMatrix, traceBackMatrix
 
 # traceBack
-# Purpose: print out the aligned sequences by tracing back from the 
+# Purpose: read out the aligned sequences by tracing back from the 
 #          rightmost bottommost element in an alignment matrix
-# Parameters: the length of s1 and the length of s2.
-# Returns: N/A
-def traceBack(s1len, s2len):
+# Parameters: the traceback matrix and the two sequences
+# Returns: the two aligned strings
+def traceBack(traceBackMatrix, s1, s2):
     alignStk = []
-    i = s1len
-    j = s2len
+    i = len(s1)
+    j = len(s2)
     while i > 0 or j > 0: 
         if traceBackMatrix[i][j] == 0:
             alignStk.append((s1[i - 1], s2[j - 1]))
@@ -82,54 +101,176 @@ def traceBack(s1len, s2len):
             alignStk.append((s1[i - 1], "-"))
             i -= 1 
 
-    s1alned = ""
-    s2alned = ""
+    s1alned = []
+    s2alned = []
     for _ in range(len(alignStk)):
         currPair = alignStk.pop()
-        s1alned += currPair[0]
-        s2alned += currPair[1]
-    print(s1alned)
-    print(s2alned)
+        s1alned.append(currPair[0])
+        s2alned.append(currPair[1])
+    return "".join(s1alned), "".join(s2alned)
+
+# readFasta
+# Purpose: read the records of a FASTA formatted input, ignoring
+#          empty lines
+# Parameters: lines is any iterable of lines, e.g. sys.stdin or an
+#             opened file
+# Returns: a list of (header, sequence) pairs, where header is the
+#          legend line without its leading '>'
+def readFasta(lines):
+    records = []
+    header = None
+    chunks = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line == "":
+            continue
+        if line[0] == '>':
+            if header is not None:
+                records.append((header, "".join(chunks)))
+            header = line[1:].strip()
+            chunks = []
+        else:
+            chunks.append(line)
+    if header is not None:
+        records.append((header, "".join(chunks)))
+    return records
 
+# alignSeqs
+# Purpose: globally align two sequences with one of the engines
+# Parameters: s1 and s2 are the sequences, match, mismatch and gap
+#             are the scores and mode is one of the engines in modes;
+#             in "banded" mode, band fixes the number of extra diagonals
+#             (the band widens automatically when it is None) and xdrop
+#             is the optional X-drop threshold; table is an optional
+#             substitution lookup table replacing match and mismatch,
+#             and a non-zero gapOpen turns gap into the extension score
+#             of affine gaps (numpy and score modes only)
+# Returns: the alignment score and the two aligned strings, which are
+#          None in "score" mode; all three are None when the X-drop
+#          criterion ended a banded alignment
+def alignSeqs(s1, s2, match=defaultMatch, mismatch=defaultMismatch,
+              gap=defaultGap, mode="numpy", band=None, xdrop=None,
+              table=None, gapOpen=0):
+    if mode == "naive":
+        if table is not None or gapOpen != 0:
+            raise ValueError("The naive mode only supports the match/mismatch/gap scores")
+        alignMatrix, traceBackMatrix = fillAllMatrices(s1, s2, match, mismatch, gap)
+        s1alned, s2alned = traceBack(traceBackMatrix, s1, s2)
+        return alignMatrix[-1][-1], s1alned, s2alned
+    if mode not in modes:
+        raise ValueError("Mode not supported: " + mode)
 
-# start of the program
+    if table is None:
+        table = scoreTable(match, mismatch)
+    if gapOpen != 0:
+        if mode == "score":
+            return gotohScore(s1, s2, table, gapOpen, gap), None, None
+        elif mode == "numpy":
+            return gotohAlign(s1, s2, table, gapOpen, gap)
+        raise ValueError("Affine gaps are only supported in numpy and score modes")
 
-# Default values for M, m and g are set as follows
-match = 4
-mismatch = -2
-gap = -2
-
-# Only if the user inputted the correct number of arguments 
-# for M, m and g does the program accepts them as new 
-# scores for M, m and g
-if len(sys.argv) == 4:
-    match = int(sys.argv[1])
-    mismatch = int(sys.argv[2])
-    gap = int(sys.argv[3])
-
-# Sequence strings are initialized to empty strings
-seq = ["",""]
-
-# Reading in the two sequences from stdin, ignoring the 
-# commenting legends above the sequence content
-index = -1
-for line in sys.stdin:
-    if (line[0] == '>'):
-        index += 1
+    if mode == "score":
+        return nwScore(s1, s2, table, gap), None, None
+    elif mode == "hirschberg":
+        return hirschbergAlign(s1, s2, table, gap)
+    elif mode == "banded":
+        if band is None:
+            result = bandedAlign(s1, s2, table, gap, xdrop=xdrop)
+        else:
+            result = bandedAlign(s1, s2, table, gap, band, False, xdrop)
+        if result is None:
+            return None, None, None
+        return result
+    else: # mode == "numpy"
+        return nwAlign(s1, s2, table, gap)
+
+# parseScheme
+# Purpose: read the M, m and g arguments of the command line
+# Parameters: matchArg, mismatchArg and gapArg are the three argument
+#             strings; matchArg may also name a substitution matrix
+#             file (mismatchArg is then ignored), and gapArg may be
+#             "open,extend" for affine gaps
+# Returns: (match, mismatch, gap, table, gapOpen) to be passed on to
+#          alignSeqs
+# Note: the gap-open score must not be positive, as the affine rows
+#       of alignEngine.gotohRows never open a gap right after another
+def parseScheme(matchArg, mismatchArg, gapArg):
+    match = defaultMatch
+    mismatch = defaultMismatch
+    table = None
+    try:
+        match = int(matchArg)
+        mismatch = int(mismatchArg)
+    except ValueError:
+        table = readSubMatrix(matchArg)
+
+    gapOpen = 0
+    if "," in gapArg:
+        gapOpen = int(gapArg.split(",")[0])
+        gap = int(gapArg.split(",")[1])
     else:
-        while line[-1] == "\n" or line[-1] == "\r":
-            line = line[0:-1]
-        seq[index] += line
+        gap = int(gapArg)
+    if gapOpen > 0:
+        raise ValueError("The gap-open score must not be positive")
+    return match, mismatch, gap, table, gapOpen
+
+
+# start of the program
+if __name__ == "__main__":
+    match = defaultMatch
+    mismatch = defaultMismatch
+    gap = defaultGap
+    mode = "numpy"
+    band = None
+    xdrop = None
+    table = None
+    gapOpen = 0
+
+    # Only if the user inputted the correct number of arguments 
+    # for M, m and g does the program accepts them as new 
+    # scores for M, m and g
+    if len(sys.argv) >= 4 and len(sys.argv) <= 7:
+        try:
+            match, mismatch, gap, table, gapOpen = parseScheme(sys.argv[1], sys.argv[2],
+                                                               sys.argv[3])
+        except ValueError as err:
+            print(err)
+            exit(1)
 
-s1 = seq[0]
-s2 = seq[1]
+    # The engine can be chosen either alone or after M, m and g
+    if len(sys.argv) == 2:
+        mode = sys.argv[1]
+    elif len(sys.argv) >= 5:
+        mode = sys.argv[4]
 
-m = len(s1)
-n = len(s2)
+    # The banded mode can be followed by the band ("auto" to widen it
+    # automatically) and the X-drop threshold
+    if len(sys.argv) >= 6 and mode == "banded":
+        if sys.argv[5] != "auto":
+            band = int(sys.argv[5])
+        if len(sys.argv) == 7:
+            xdrop = int(sys.argv[6])
 
-# Initializing the matrices
-alignMatrix = []
-traceBackMatrix = []
+    if mode not in modes:
+        print("Mode not supported, please use one of:", ", ".join(modes))
+        exit(1)
 
-fillAllMatrices()
-traceBack(m,n)
+    # Reading in the two sequences from stdin, ignoring the 
+    # commenting legends above the sequence content
+    seqs = readFasta(sys.stdin)
+    s1 = seqs[0][1]
+    s2 = seqs[1][1]
+
+    try:
+        alnScore, s1alned, s2alned = alignSeqs(s1, s2, match, mismatch, gap, mode,
+                                               band, xdrop, table, gapOpen)
+    except ValueError as err:
+        print(err)
+        exit(1)
+    if alnScore is None:
+        print("Alignment ended by the X-drop criterion")
+    elif mode == "score":
+        print(alnScore)
+    else:
+        print(s1alned)
+        print(s2alned)
@@ -0,0 +1,629 @@
+'''
+File name: alignEngine.py
+Purpose: NumPy engine for the global alignment algorithm. The
+Needleman-Wunsch recurrence is computed one row at a time on
+integer arrays instead of cell by cell on Python lists, with a
+score-only mode that keeps O(n) memory and a traceback mode that
+stores one uint8 per cell.
+'''
+import numpy as np
+
+# Traceback codes, identical to the ones used by align.py
+DIAG = 0
+VERT = 1
+HORI = 2
+
+# encodeSeq
+# Purpose: turn a sequence string into an array of its byte values
+# Parameters: seq is the sequence string
+# Returns: a numpy uint8 array with one entry per letter
+def encodeSeq(seq):
+    return np.frombuffer(seq.encode("ascii"), dtype=np.uint8)
+
+# scoreTable
+# Purpose: build the substitution lookup table of the naive scoring
+#          function, indexed by the byte values of two letters
+# Parameters: match and mismatch are the scores of matching and
+#             mismatching letters
+# Returns: a 256x256 numpy int64 array
+def scoreTable(match, mismatch):
+    table = np.full((256, 256), mismatch, dtype=np.int64)
+    np.fill_diagonal(table, match)
+    return table
+
+# readSubMatrix
+# Purpose: read a substitution matrix (BLOSUM, PAM, ...) in the NCBI
+#          text format: '#' comment lines, a header line of letters,
+#          then one line per letter starting with that letter
+# Parameters: fname is the file name of the matrix
+# Returns: a 256x256 numpy int64 lookup table indexed by byte values;
+#          lower case letters score as upper case ones and pairs with
+#          letters missing from the matrix get its lowest score
+def readSubMatrix(fname):
+    letters = None
+    rows = {}
+    with open(fname, "r") as fstream:
+        for line in fstream:
+            fields = line.split()
+            if len(fields) == 0 or fields[0][0] == '#':
+                continue
+            if letters is None:
+                letters = fields
+            else:
+                rows[fields[0]] = [int(x) for x in fields[1:]]
+
+    lowest = min(min(row) for row in rows.values())
+    table = np.full((256, 256), lowest, dtype=np.int64)
+    for p in rows:
+        for q, value in zip(letters, rows[p]):
+            for pc in set([p.upper(), p.lower()]):
+                for qc in set([q.upper(), q.lower()]):
+                    table[ord(pc), ord(qc)] = value
+    return table
+
+# pairMax
+# Purpose: find the best score of a pair of letters of two sequences
+# Parameters: table is the substitution lookup table, a and b are the
+#             encoded sequences
+# Returns: the highest table entry over the letters of a and b
+def pairMax(table, a, b):
+    if len(a) == 0 or len(b) == 0:
+        return int(table.max())
+    return int(table[np.ix_(np.unique(a), np.unique(b))].max())
+
+# gapLine
+# Purpose: build the first row (or column) of an alignment matrix
+# Parameters: length is the number of letters along that side, gap
+#             is the uniform gap score
+# Returns: a numpy int64 array [0, g, 2g, ..., length*g]
+def gapLine(length, gap):
+    return np.arange(length + 1, dtype=np.int64) * gap
+
+# nwRows
+# Purpose: run the Needleman-Wunsch recurrence over the rows of the
+#          alignment matrix, keeping only the previous row in memory
+# Parameters: a and b are the encoded sequences (rows and columns),
+#             table is the substitution lookup table and gap is the
+#             gap score,
+#             top and left are the optional values of row 0 and
+#             column 0 (gap multiples by default), which lets the
+#             recurrence run on a sub-rectangle of a larger matrix
+# Returns: a generator yielding (i, diag, vert, curr) for every row
+#          i >= 1, where diag and vert are the candidate scores of
+#          cells 1..n and curr is the complete row i
+# Note: the horizontal gap chain of a row is a prefix maximum:
+#       H[i][j] = j*g + max over k <= j of (T[k] - k*g), where T[k]
+#       is the best of the diagonal and vertical candidates, so a
+#       row costs a few array operations
+def nwRows(a, b, table, gap, top=None, left=None):
+    gapCols = gapLine(len(b), gap)
+    prev = gapCols.copy() if top is None else top
+    best = np.empty(len(b) + 1, dtype=np.int64)
+    for i in range(1, len(a) + 1):
+        diag = prev[:-1] + table[a[i - 1]][b]
+        vert = prev[1:] + gap
+        best[0] = i * gap if left is None else left[i]
+        np.maximum(diag, vert, out=best[1:])
+        best -= gapCols
+        curr = np.maximum.accumulate(best)
+        curr += gapCols
+        yield i, diag, vert, curr
+        prev = curr
+
+# rowCodes
+# Purpose: turn the candidates of one row into traceback codes
+# Parameters: diag and vert are the candidate scores of some cells of
+#             the row, cells are the final scores of the same cells and
+#             out is the array receiving their codes
+# Returns: N/A
+# Note: the preference is diagonal > vertical > horizontal
+def rowCodes(diag, vert, cells, out):
+    out.fill(HORI)
+    out[vert == cells] = VERT
+    out[diag == cells] = DIAG
+
+# nwLastRow
+# Purpose: compute the last row of the alignment matrix in O(n) memory
+# Parameters: s1 and s2 are the sequence strings, table is the
+#             substitution lookup table and gap is the gap score
+# Returns: a numpy int64 array holding row len(s1) of the matrix
+def nwLastRow(s1, s2, table, gap):
+    b = encodeSeq(s2)
+    last = gapLine(len(b), gap)
+    for _, _, _, curr in nwRows(encodeSeq(s1), b, table, gap):
+        last = curr
+    return last
+
+# nwScore
+# Purpose: compute the global alignment score only, in O(n) memory
+# Parameters: s1 and s2 are the sequence strings, table is the
+#             substitution lookup table and gap is the gap score
+# Returns: the optimal alignment score as an integer
+def nwScore(s1, s2, table, gap):
+    return int(nwLastRow(s1, s2, table, gap)[-1])
+
+# traceCodes
+# Purpose: fill the traceback matrix of a (sub-)rectangle
+# Parameters: a and b are the encoded sequences, table is the
+#             substitution lookup table and gap is the gap score, top
+#             and left are the optional values of row 0 and column 0
+# Returns: the bottom right score and a (m+1)x(n+1) uint8 matrix of
+#          traceback codes, whose top row is all horizontal and whose
+#          left column is all vertical
+def traceCodes(a, b, table, gap, top=None, left=None):
+    tbMatrix = np.empty((len(a) + 1, len(b) + 1), dtype=np.uint8)
+    tbMatrix[0, :] = HORI
+    tbMatrix[1:, 0] = VERT
+    last = gapLine(len(b), gap) if top is None else top
+    for i, diag, vert, curr in nwRows(a, b, table, gap, top, left):
+        rowCodes(diag, vert, curr[1:], tbMatrix[i, 1:])
+        last = curr
+    return int(last[-1]), tbMatrix
+
+# nwTraceMatrix
+# Purpose: fill a compact traceback matrix for s1 and s2
+# Parameters: s1 and s2 are the sequence strings, table is the
+#             substitution lookup table and gap is the gap score
+# Returns: the optimal score and a (m+1)x(n+1) uint8 matrix of
+#          traceback codes
+def nwTraceMatrix(s1, s2, table, gap):
+    return traceCodes(encodeSeq(s1), encodeSeq(s2), table, gap)
+
+# traceMoves
+# Purpose: walk a traceback matrix from its rightmost bottommost element
+#          back to its top left element
+# Parameters: tbMatrix is a matrix of traceback codes
+# Returns: a list of the codes taken, from the last column of the
+#          alignment to the first
+def traceMoves(tbMatrix):
+    moves = []
+    i = tbMatrix.shape[0] - 1
+    j = tbMatrix.shape[1] - 1
+    while i > 0 or j > 0:
+        code = tbMatrix[i, j]
+        moves.append(code)
+        if code == DIAG:
+            i -= 1
+            j -= 1
+        elif code == HORI:
+            j -= 1
+        else: # code == VERT
+            i -= 1
+    return moves
+
+# movesToAligned
+# Purpose: build the aligned strings from a list of traceback codes
+# Parameters: moves lists the codes from the last alignment column to
+#             the first, s1 and s2 are the sequence strings
+# Returns: the two aligned strings
+def movesToAligned(moves, s1, s2):
+    s1alned = []
+    s2alned = []
+    i = len(s1)
+    j = len(s2)
+    for code in moves:
+        if code == DIAG:
+            i -= 1
+            j -= 1
+            s1alned.append(s1[i])
+            s2alned.append(s2[j])
+        elif code == HORI:
+            j -= 1
+            s1alned.append("-")
+            s2alned.append(s2[j])
+        else: # code == VERT
+            i -= 1
+            s1alned.append(s1[i])
+            s2alned.append("-")
+    return "".join(reversed(s1alned)), "".join(reversed(s2alned))
+
+# traceBackMatrix
+# Purpose: read the aligned sequences off a traceback matrix, starting
+#          from the rightmost bottommost element
+# Parameters: tbMatrix is the traceback matrix of s1 and s2
+# Returns: the two aligned strings
+def traceBackMatrix(tbMatrix, s1, s2):
+    return movesToAligned(traceMoves(tbMatrix), s1, s2)
+
+# nwAlign
+# Purpose: globally align two sequences with the NumPy engine
+# Parameters: s1 and s2 are the sequence strings, table is the
+#             substitution lookup table and gap is the gap score
+# Returns: the optimal score and the two aligned strings
+def nwAlign(s1, s2, table, gap):
+    alnScore, tbMatrix = nwTraceMatrix(s1, s2, table, gap)
+    s1alned, s2alned = traceBackMatrix(tbMatrix, s1, s2)
+    return alnScore, s1alned, s2alned
+
+# Rectangles with at most this many cells are solved directly with a
+# traceback matrix by the Hirschberg recursion
+hbCellLimit = 1 << 16
+
+# entryColumn
+# Purpose: find where the traceback path of a rectangle enters its
+#          middle row, without storing the lower half of the matrix
+# Parameters: a and b are the encoded sequences of the lower half,
+#             table is the substitution lookup table and gap is the
+#             gap score,
+#             top is the middle row and left is the left column of the
+#             lower half
+# Returns: the column (relative to b) at which the path from the
+#          bottom right cell first reaches the middle row
+# Note: every cell carries the entry column of the traceback path
+#       starting from it, copied from the cell its code points to;
+#       horizontal runs are resolved with a prefix maximum
+def entryColumn(a, b, table, gap, top, left):
+    cols = np.arange(len(b) + 1)
+    entry = cols.copy()
+    codes = np.empty(len(b) + 1, dtype=np.uint8)
+    codes[0] = VERT
+    src = np.empty(len(b) + 1, dtype=np.int64)
+    for _, diag, vert, curr in nwRows(a, b, table, gap, top, left):
+        rowCodes(diag, vert, curr[1:], codes[1:])
+        src[0] = entry[0]
+        src[1:] = np.where(codes[1:] == DIAG, entry[:-1], entry[1:])
+        anchor = np.maximum.accumulate(np.where(codes != HORI, cols, 0))
+        entry = src[anchor]
+    return int(entry[-1])
+
+# hirschbergMoves
+# Purpose: compute the traceback codes of a rectangle in linear space
+# Parameters: a and b are the encoded sequences, table is the
+#             substitution lookup table and gap is the gap score, top
+#             and left are the values of row 0 and column 0 of the
+#             rectangle
+# Returns: a list of the codes from the bottom right cell to the top
+#          left cell, identical to walking the full traceback matrix
+# Note: the rectangle is split at its middle row; the lower half is
+#       solved first as its codes come first in the list. The lower
+#       half keeps the global matrix values on its boundary, so every
+#       code matches the one the full matrix would hold.
+def hirschbergMoves(a, b, table, gap, top, left):
+    moves = []
+    stack = [(a, b, top, left)]
+    while stack:
+        a, b, top, left = stack.pop()
+        if len(a) <= 1 or (len(a) + 1) * (len(b) + 1) <= hbCellLimit:
+            _, tbMatrix = traceCodes(a, b, table, gap, top, left)
+            moves.extend(traceMoves(tbMatrix))
+            continue
+
+        mid = len(a) // 2
+        midRow = top
+        for _, _, _, curr in nwRows(a[:mid], b, table, gap,
+                                    top, left[:mid + 1]):
+            midRow = curr
+        col = entryColumn(a[mid:], b, table, gap,
+                          midRow, left[mid:])
+
+        # the lower half needs the global values of its left column,
+        # which lies inside the rectangle unless col is 0
+        lowLeft = left[mid:]
+        if col > 0:
+            lowLeft = np.empty(len(a) - mid + 1, dtype=np.int64)
+            lowLeft[0] = midRow[col]
+            for i, _, _, curr in nwRows(a[mid:], b[:col], table,
+                                        gap, midRow[:col + 1], left[mid:]):
+                lowLeft[i] = curr[-1]
+
+        stack.append((a[:mid], b[:col], top[:col + 1].copy(),
+                      left[:mid + 1].copy()))
+        stack.append((a[mid:], b[col:], midRow[col:].copy(),
+                      lowLeft.copy()))
+    return moves
+
+# alignedScore
+# Purpose: score an alignment given as two aligned strings
+# Parameters: s1alned and s2alned are the aligned strings, table is
+#             the substitution lookup table and gap is the gap score
+# Returns: the score of the alignment as an integer
+def alignedScore(s1alned, s2alned, table, gap):
+    x = encodeSeq(s1alned)
+    y = encodeSeq(s2alned)
+    gaps = (x == ord("-")) | (y == ord("-"))
+    return int(np.where(gaps, gap, table[x, y]).sum())
+
+# hirschbergAlign
+# Purpose: globally align two sequences with Hirschberg's divide and
+#          conquer scheme, using O(m+n) memory
+# Parameters: s1 and s2 are the sequence strings, table is the
+#             substitution lookup table and gap is the gap score
+# Returns: the optimal score and the two aligned strings, the same as
+#          the ones read off the full traceback matrix
+def hirschbergAlign(s1, s2, table, gap):
+    a = encodeSeq(s1)
+    b = encodeSeq(s2)
+    moves = hirschbergMoves(a, b, table, gap,
+                            gapLine(len(b), gap), gapLine(len(a), gap))
+    s1alned, s2alned = movesToAligned(moves, s1, s2)
+    alnScore = alignedScore(s1alned, s2alned, table, gap)
+    return alnScore, s1alned, s2alned
+
+# Stand-in for minus infinity outside of a band, far enough from the
+# int64 limits that adding scores to it cannot overflow
+negInf = -(1 << 60)
+
+# bandWindow
+# Purpose: read the values of columns lo..hi from a band row
+# Parameters: row holds the values of columns start..start+len(row)-1,
+#             lo and hi are the first and last columns wanted
+# Returns: a numpy int64 array of the hi-lo+1 values, negInf outside
+#          of the band
+def bandWindow(row, start, lo, hi):
+    out = np.full(hi - lo + 1, negInf, dtype=np.int64)
+    first = max(lo, start)
+    last = min(hi, start + len(row) - 1)
+    if first <= last:
+        out[first - lo:last - lo + 1] = row[first - start:last - start + 1]
+    return out
+
+# bandedCodes
+# Purpose: fill the traceback codes of the cells with lo <= j-i <= hi
+# Parameters: a and b are the encoded sequences, table is the
+#             substitution lookup table and gap is the gap score, lo
+#             and hi are the lowest and highest diagonals of the band,
+#             xdrop is the X-drop threshold or None
+# Returns: the bottom right score and a (m+1)x(hi-lo+1) uint8 matrix,
+#          where cell (i, j) is stored at column j-i-lo; or None when
+#          the best score of a row falls more than xdrop below the best
+#          score of an earlier row
+def bandedCodes(a, b, table, gap, lo, hi, xdrop=None):
+    m = len(a)
+    n = len(b)
+    tbMatrix = np.full((m + 1, hi - lo + 1), HORI, dtype=np.uint8)
+    start = 0
+    prev = gapLine(min(n, hi), gap)
+    bestSeen = prev.max()
+    for i in range(1, m + 1):
+        c0 = max(0, i + lo)
+        c1 = min(n, i + hi)
+        up = bandWindow(prev, start, c0 - 1, c1)
+        offsets = np.arange(c1 - c0 + 1, dtype=np.int64) * gap
+        best = np.empty(c1 - c0 + 1, dtype=np.int64)
+        j0 = max(c0, 1)
+        diag = up[j0 - c0:-1] + table[a[i - 1]][b[j0 - 1:c1]]
+        vert = up[j0 - c0 + 1:] + gap
+        if c0 == 0:
+            best[0] = i * gap
+        np.maximum(diag, vert, out=best[j0 - c0:])
+        best -= offsets
+        curr = np.maximum.accumulate(best)
+        curr += offsets
+
+        codes = tbMatrix[i, c0 - i - lo:c1 - i - lo + 1]
+        if c0 == 0:
+            codes[0] = VERT
+        rowCodes(diag, vert, curr[j0 - c0:], codes[j0 - c0:])
+
+        rowBest = curr.max()
+        if xdrop is not None and rowBest < bestSeen - xdrop:
+            return None
+        bestSeen = max(bestSeen, rowBest)
+        prev = curr
+        start = c0
+    return int(prev[n - start]), tbMatrix
+
+# bandedMoves
+# Purpose: walk a band traceback matrix from the bottom right cell
+# Parameters: tbMatrix is the matrix filled by bandedCodes, lo is the
+#             lowest diagonal of the band, m and n are the sequence
+#             lengths
+# Returns: a list of the codes from the last alignment column to the
+#          first
+def bandedMoves(tbMatrix, lo, m, n):
+    moves = []
+    i = m
+    j = n
+    while i > 0 or j > 0:
+        code = tbMatrix[i, j - i - lo]
+        moves.append(code)
+        if code == DIAG:
+            i -= 1
+            j -= 1
+        elif code == HORI:
+            j -= 1
+        else: # code == VERT
+            i -= 1
+    return moves
+
+# outsideBound
+# Purpose: bound the score of any global alignment whose path leaves
+#          the band lo <= j-i <= hi
+# Parameters: m and n are the sequence lengths, lo and hi the band,
+#             maxScore is the best score of a pair of letters and gap
+#             is the gap score
+# Returns: the upper bound, or None if no path can leave the band
+# Note: a path touching diagonal d has at least |d| + |n-m-d| gaps, and
+#       every gap pair replaces one aligned pair of letters
+def outsideBound(m, n, lo, hi, maxScore, gap):
+    bound = None
+    for d in [lo - 1, hi + 1]:
+        if d < -m or d > n:
+            continue
+        numGaps = abs(d) + abs(n - m - d)
+        numPairs = min(m, n, (m + n - numGaps) // 2)
+        dScore = numPairs * maxScore + (m + n - 2 * numPairs) * gap
+        if bound is None or dScore > bound:
+            bound = dScore
+    return bound
+
+# bandLimits
+# Purpose: give the lowest and highest diagonals of a band
+# Parameters: m and n are the sequence lengths, band is the number of
+#             extra diagonals on each side of the ones joining (0, 0)
+#             and (m, n)
+# Returns: (lo, hi) such that the band holds the cells lo <= j-i <= hi
+def bandLimits(m, n, band):
+    return min(0, n - m) - band, max(0, n - m) + band
+
+# neededBand
+# Purpose: find the narrowest band outside of which no alignment can
+#          reach a given score
+# Parameters: m and n are the sequence lengths, alnScore is the score to
+#             beat, band is the narrowest band to consider, maxScore
+#             is the best score of a pair of letters and gap is the
+#             gap score
+# Returns: the smallest band >= band whose outside bound is below
+#          alnScore
+def neededBand(m, n, alnScore, band, maxScore, gap):
+    low = band
+    high = m + n
+    while low < high:
+        mid = (low + high) // 2
+        bound = outsideBound(m, n, *bandLimits(m, n, mid), maxScore, gap)
+        if bound is None or bound < alnScore:
+            high = mid
+        else:
+            low = mid + 1
+    return low
+
+# bandedAlign
+# Purpose: globally align two sequences within a band around the main
+#          diagonal, in O(band*n) time and memory
+# Parameters: s1 and s2 are the sequence strings, table is the
+#             substitution lookup table and gap is the gap score, band
+#             is the (initial) number of extra diagonals on each side,
+#             autoWiden widens the band until the result is proven
+#             optimal, xdrop stops the alignment early when the
+#             sequences diverge
+# Returns: the score and the two aligned strings, or None when the
+#          X-drop criterion ended the alignment
+# Note: when the banded score beats every path that leaves the band, all
+#       optimal paths lie inside it and the alignment is identical to
+#       the full one. A banded score is a lower bound of the optimum, so
+#       the band it calls for is wide enough after at most a few passes.
+#       Without a non-negative best score and a gap score below half of
+#       it no bound holds, and the full matrix is used directly.
+def bandedAlign(s1, s2, table, gap, band=16, autoWiden=True, xdrop=None):
+    a = encodeSeq(s1)
+    b = encodeSeq(s2)
+    m = len(a)
+    n = len(b)
+    maxScore = pairMax(table, a, b)
+    if autoWiden and (maxScore < 0 or 2 * gap >= maxScore):
+        band = m + n
+    while True:
+        lo, hi = bandLimits(m, n, band)
+        result = bandedCodes(a, b, table, gap, lo, hi, xdrop)
+        if result is None:
+            return None
+        alnScore, tbMatrix = result
+        if not autoWiden:
+            break
+        needed = neededBand(m, n, alnScore, band, maxScore, gap)
+        if needed <= band:
+            break
+        band = needed
+    moves = bandedMoves(tbMatrix, lo, m, n)
+    s1alned, s2alned = movesToAligned(moves, s1, s2)
+    return alnScore, s1alned, s2alned
+
+# Extra bits of an affine traceback code, whose two low bits hold the
+# source of the best score (DIAG, VERT or HORI): whether the vertical
+# or horizontal gap ending in the cell extends a gap of the cell above
+# or on the left instead of opening a new one
+VERT_EXT = 4
+HORI_EXT = 8
+
+# gotohRows
+# Purpose: run Gotoh's three-matrix recurrence for affine gaps over the
+#          rows of the alignment matrix, keeping only the previous row
+# Parameters: a and b are the encoded sequences, table is the
+#             substitution lookup table, a gap of length L scores
+#             gapOpen + L*gapExtend
+# Returns: a generator yielding (i, curr, codes) for every row i >= 1,
+#          where curr is the complete row of best scores and codes are
+#          the affine traceback codes of cells 1..n
+# Note: as gapOpen <= 0, a horizontal gap never starts right after
+#       another one, so the horizontal gap matrix is a prefix maximum
+#       over the best of the diagonal and vertical candidates
+def gotohRows(a, b, table, gapOpen, gapExtend):
+    n = len(b)
+    extCols = np.arange(n + 1, dtype=np.int64) * gapExtend
+    prev = extCols + gapOpen
+    prev[0] = 0
+    prevVert = np.full(n + 1, negInf, dtype=np.int64)
+    best = np.empty(n + 1, dtype=np.int64)
+    hori = np.empty(n + 1, dtype=np.int64)
+    for i in range(1, len(a) + 1):
+        diag = prev[:-1] + table[a[i - 1]][b]
+        vertOpen = prev[1:] + (gapOpen + gapExtend)
+        vert = np.maximum(prevVert[1:] + gapExtend, vertOpen)
+
+        best[0] = gapOpen + i * gapExtend
+        np.maximum(diag, vert, out=best[1:])
+        hori[1:] = np.maximum.accumulate(best - extCols)[:-1]
+        hori[1:] += extCols[1:] + gapOpen
+        curr = best.copy()
+        np.maximum(best[1:], hori[1:], out=curr[1:])
+
+        codes = np.full(n, HORI, dtype=np.uint8)
+        codes[vert == curr[1:]] = VERT
+        codes[diag == curr[1:]] = DIAG
+        codes[vert > vertOpen] |= VERT_EXT
+        codes[hori[1:] > curr[:-1] + (gapOpen + gapExtend)] |= HORI_EXT
+        yield i, curr, codes
+
+        prevVert[0] = curr[0]
+        prevVert[1:] = vert
+        prev = curr
+
+# gotohScore
+# Purpose: compute the affine-gap global alignment score only, in O(n)
+#          memory
+# Parameters: s1 and s2 are the sequence strings, table is the
+#             substitution lookup table, a gap of length L scores
+#             gapOpen + L*gapExtend
+# Returns: the optimal alignment score as an integer
+def gotohScore(s1, s2, table, gapOpen, gapExtend):
+    b = encodeSeq(s2)
+    alnScore = gapOpen + len(b) * gapExtend if len(b) > 0 else 0
+    for _, curr, _ in gotohRows(encodeSeq(s1), b, table, gapOpen, gapExtend):
+        alnScore = curr[-1]
+    return int(alnScore)
+
+# gotohMoves
+# Purpose: walk an affine traceback matrix from the bottom right cell,
+#          staying in a gap for as long as its codes say it extends
+# Parameters: tbMatrix is a matrix of affine traceback codes
+# Returns: a list of the codes (DIAG, VERT or HORI) from the last
+#          alignment column to the first
+def gotohMoves(tbMatrix):
+    moves = []
+    i = tbMatrix.shape[0] - 1
+    j = tbMatrix.shape[1] - 1
+    inGap = None
+    while i > 0 or j > 0:
+        code = int(tbMatrix[i, j])
+        move = (code & 3) if inGap is None else inGap
+        moves.append(move)
+        if move == DIAG:
+            i -= 1
+            j -= 1
+        elif move == VERT:
+            i -= 1
+            inGap = VERT if code & VERT_EXT else None
+        else: # move == HORI
+            j -= 1
+            inGap = HORI if code & HORI_EXT else None
+    return moves
+
+# gotohAlign
+# Purpose: globally align two sequences with affine gap scores
+# Parameters: s1 and s2 are the sequence strings, table is the
+#             substitution lookup table, a gap of length L scores
+#             gapOpen + L*gapExtend
+# Returns: the optimal score and the two aligned strings
+# Note: with gapOpen = 0 the alignment is the same as nwAlign's
+def gotohAlign(s1, s2, table, gapOpen, gapExtend):
+    a = encodeSeq(s1)
+    b = encodeSeq(s2)
+    tbMatrix = np.empty((len(a) + 1, len(b) + 1), dtype=np.uint8)
+    tbMatrix[0, :] = HORI | HORI_EXT
+    tbMatrix[1:, 0] = VERT | VERT_EXT
+    alnScore = gapOpen + len(b) * gapExtend if len(b) > 0 else 0
+    for i, curr, codes in gotohRows(a, b, table, gapOpen, gapExtend):
+        tbMatrix[i, 1:] = codes
+        alnScore = curr[-1]
+    s1alned, s2alned = movesToAligned(gotohMoves(tbMatrix), s1, s2)
+    return int(alnScore), s1alned, s2alned
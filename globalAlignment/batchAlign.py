@@ -0,0 +1,144 @@
+'''
+File name: batchAlign.py
+Purpose: Batch global alignment of the records of a multi-FASTA file,
+either all against all or one query against all the others. Pairs are
+scheduled across a pool of worker processes and every result is
+written out as soon as it finishes.
+'''
+import os
+import sys
+from multiprocessing import Pool
+from align import readFasta, alignSeqs, parseScheme, modes, defaultMatch, defaultMismatch, defaultGap
+
+# Records and scoring scheme of a worker process, set once by
+# initWorker so that tasks only carry a pair of record indices
+workerRecords = []
+workerScheme = ()
+
+# initWorker
+# Purpose: store the records and the scoring scheme in a worker process
+# Parameters: records is the list of (header, sequence) pairs, scheme
+#             is the tuple of arguments passed on to alignSeqs after
+#             the two sequences
+# Returns: N/A
+def initWorker(records, scheme):
+    global workerRecords, workerScheme
+    workerRecords = records
+    workerScheme = scheme
+
+# alignTask
+# Purpose: align one pair of records inside a worker process
+# Parameters: pair is the (i, j) tuple of record indices
+# Returns: (i, j, score, s1alned, s2alned)
+def alignTask(pair):
+    i, j = pair
+    alnScore, s1alned, s2alned = alignSeqs(workerRecords[i][1],
+                                           workerRecords[j][1], *workerScheme)
+    return i, j, alnScore, s1alned, s2alned
+
+# makePairs
+# Purpose: list the pairs of records to be aligned
+# Parameters: records is the list of (header, sequence) pairs, query
+#             is the index of the query record or None for all vs all
+# Returns: a list of (i, j) index tuples, largest alignments first so
+#          that the long tasks do not end up alone at the tail of the run
+def makePairs(records, query=None):
+    if query is None:
+        pairs = [(i, j) for i in range(len(records))
+                 for j in range(i + 1, len(records))]
+    else:
+        pairs = [(query, j) for j in range(len(records)) if j != query]
+    pairs.sort(key=lambda p: len(records[p[0]][1]) * len(records[p[1]][1]),
+               reverse=True)
+    return pairs
+
+# batchAlign
+# Purpose: align pairs of records across a process pool
+# Parameters: records is the list of (header, sequence) pairs, query
+#             is the index of the query record or None for all vs all,
+#             match, mismatch, gap, mode, table and gapOpen are passed
+#             on to alignSeqs, numWorkers is the size of the pool (all
+#             cores by default)
+# Returns: a generator yielding (i, j, score, s1alned, s2alned) in the
+#          order the alignments finish
+def batchAlign(records, query=None, match=defaultMatch, mismatch=defaultMismatch,
+               gap=defaultGap, mode="numpy", table=None, gapOpen=0, numWorkers=None):
+    pairs = makePairs(records, query)
+    if numWorkers is None:
+        numWorkers = os.cpu_count() or 1
+    numWorkers = max(1, min(numWorkers, len(pairs)))
+    chunk = max(1, len(pairs) // (numWorkers * 16))
+    scheme = (match, mismatch, gap, mode, None, None, table, gapOpen)
+    with Pool(numWorkers, initWorker, (records, scheme)) as pool:
+        for result in pool.imap_unordered(alignTask, pairs, chunk):
+            yield result
+
+# findQuery
+# Purpose: find a record by its identifier (first word of its header)
+#          or by its 0-based index
+# Parameters: records is the list of (header, sequence) pairs, query is
+#             the identifier or index given by the user
+# Returns: the index of the record, or None if there is no such record
+def findQuery(records, query):
+    for i in range(len(records)):
+        if records[i][0].split(" ")[0] == query:
+            return i
+    if query.isdigit() and int(query) < len(records):
+        return int(query)
+    return None
+
+
+# Main function starts here
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3, 6, 7, 8]:
+        print("Usage: python3 batchAlign.py [FASTA] (all/query) (M m g) (mode) (workers)")
+        exit(1)
+
+    with open(sys.argv[1], "r") as fstream:
+        records = readFasta(fstream)
+
+    query = None
+    if len(sys.argv) > 2 and sys.argv[2] != "all":
+        query = findQuery(records, sys.argv[2])
+        if query is None:
+            print("Query not found:", sys.argv[2])
+            exit(1)
+
+    match = defaultMatch
+    mismatch = defaultMismatch
+    gap = defaultGap
+    table = None
+    gapOpen = 0
+    if len(sys.argv) > 5:
+        try:
+            match, mismatch, gap, table, gapOpen = parseScheme(sys.argv[3], sys.argv[4],
+                                                               sys.argv[5])
+        except ValueError as err:
+            print(err)
+            exit(1)
+
+    mode = "score"
+    if len(sys.argv) > 6:
+        mode = sys.argv[6]
+    if mode not in modes:
+        print("Mode not supported, please use one of:", ", ".join(modes))
+        exit(1)
+
+    numWorkers = None
+    if len(sys.argv) > 7:
+        numWorkers = int(sys.argv[7])
+
+    if mode == "naive" and (table is not None or gapOpen != 0):
+        print("The naive mode only supports the match/mismatch/gap scores")
+        exit(1)
+    if gapOpen != 0 and mode not in ["numpy", "score"]:
+        print("Affine gaps are only supported in numpy and score modes")
+        exit(1)
+
+    for i, j, alnScore, s1alned, s2alned in batchAlign(records, query, match, mismatch,
+                                                       gap, mode, table, gapOpen, numWorkers):
+        print(">" + records[i][0].split(" ")[0], records[j][0].split(" ")[0], alnScore)
+        if mode != "score":
+            print(s1alned)
+            print(s2alned)
+        sys.stdout.flush()
@@ -0,0 +1,120 @@
+"""
+gse_cache.py
+
+Description: A cache of GSE expression matrices for the k-nearest-
+neighbours classifier. A tab-separated matrix (one row per gene, one
+column per sample, and a last row of class labels) is parsed once into
+a float32 array of samples by genes saved as a .npy file, next to a
+JSON file of the sample names, the labels and the checksum of the text
+file. Later runs memory-map the array instead of parsing the text, as
+long as the checksum still matches.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+
+# Version of the layout of the cache files
+cache_version = 1
+
+# file_checksum
+# Purpose: Compute a checksum of the bytes of a file
+# Parameters: fname - the file name
+# Returns: the hex digest (BLAKE2b, 32 bytes) of the file
+def file_checksum(fname):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(fname, 'rb') as f:
+        while True:
+            data = f.read(1 << 20)
+            if len(data) == 0:
+                break
+            digest.update(data)
+    return digest.hexdigest()
+
+# cache_names
+# Purpose: Name the cache files of a matrix file
+# Parameters: fname - the name of the matrix file
+# Returns: the names of the array file and of the JSON file
+def cache_names(fname):
+    return fname + '.npy', fname + '.json'
+
+# parse_matrix
+# Purpose: Parse a tab-separated expression matrix
+# Parameters: fname - the name of the matrix file
+# Returns: features - a float32 array of the features of the samples
+#                     (one row per sample)
+#          labels - a list of the labels of the samples
+#          headers - a list of the names of the samples
+def parse_matrix(fname):
+    # pandas is only needed when the cache is built
+    import pandas as pd
+    X = pd.read_csv(fname, delimiter='\t')
+    data = X.values.T
+    features = np.array(data[:, :-1], dtype=np.float32)
+    labels = [str(label) for label in data[:, -1]]
+    return features, labels, X.columns.to_list()
+
+# write_cache
+# Purpose: Save a parsed matrix to its cache files
+# Parameters: fname - the name of the matrix file
+#             checksum - the checksum of the matrix file
+#             features, labels, headers - as parse_matrix returns them
+# Returns: N/A
+# Note: the JSON file is removed first and written last, and every file
+#       is written under a temporary name and then renamed, so the JSON
+#       file only exists next to a complete array
+def write_cache(fname, checksum, features, labels, headers):
+    array_name, info_name = cache_names(fname)
+    if os.path.exists(info_name):
+        os.remove(info_name)
+    with open(array_name + '.tmp', 'wb') as f:
+        np.save(f, features)
+    os.replace(array_name + '.tmp', array_name)
+    info = {'version': cache_version, 'checksum': checksum,
+            'shape': list(features.shape), 'labels': labels, 'headers': headers}
+    with open(info_name + '.tmp', 'w') as f:
+        json.dump(info, f)
+    os.replace(info_name + '.tmp', info_name)
+
+# read_cache
+# Purpose: Load the cache files of a matrix file
+# Parameters: fname - the name of the matrix file
+#             checksum - the checksum the matrix file has now
+# Returns: (features, labels, headers) as load_matrix returns them, or
+#          None when the cache is missing, broken or out of date
+def read_cache(fname, checksum):
+    array_name, info_name = cache_names(fname)
+    try:
+        with open(info_name, 'r') as f:
+            info = json.load(f)
+        if info['version'] != cache_version or info['checksum'] != checksum:
+            return None
+        features = np.load(array_name, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+    if list(features.shape) != info['shape'] or features.dtype != np.float32:
+        return None
+    return features, np.array(info['labels'], dtype=object), info['headers']
+
+# load_matrix
+# Purpose: Load an expression matrix, from its cache when it is up to
+#          date, and build the cache otherwise
+# Parameters: fname - the name of the matrix file
+# Returns: features - a read-only float32 array of the features of the
+#                     samples (one row per sample), memory-mapped from
+#                     the cache file
+#          labels - an array of the labels of the samples
+#          headers - a list of the names of the samples
+# Note: when the cache cannot be written (e.g. a read-only directory),
+#       the parsed matrix is returned as an array in memory
+def load_matrix(fname):
+    checksum = file_checksum(fname)
+    cached = read_cache(fname, checksum)
+    if cached is not None:
+        return cached
+    features, labels, headers = parse_matrix(fname)
+    try:
+        write_cache(fname, checksum, features, labels, headers)
+    except OSError:
+        return features, np.array(labels, dtype=object), headers
+    return read_cache(fname, checksum)
@@ -9,12 +9,10 @@ the training samples
     
 Created by Etha Hua, April 28, 2022
 """
-from cgi import test
 import numpy as np
-import pandas as pd
-from scipy.spatial import distance
-from scipy import stats
 import sys
+from ann_index import annIndex, neighbour_recall, pair_distances
+from gse_cache import load_matrix
 
 # get_data
 # Purpose: Extract training and testing samples from files
@@ -27,50 +25,151 @@ import sys
 #                         samples
 #          test_features - numpy array of the features of the testing 
 #                          samples 
+# Note: the files are parsed once into the cache of gse_cache.py, and
+#       the features are float32 arrays memory-mapped from it
 def get_data(train_fname, test_fname):
-    X = pd.read_csv(train_fname, delimiter='\t')
-    XT = pd.read_csv(test_fname, delimiter='\t')
+    train_features, train_labels, train_headers = load_matrix(train_fname)
+    test_features, test_labels, test_headers = load_matrix(test_fname)
+    return train_features, train_labels, test_features
 
-    train_data = X.values.T
-    train_features = np.array(train_data[:,:-1], dtype=float)
-    train_labels = train_data[:, -1]
+# Default number of bytes of distances computed at once
+block_bytes = 1 << 27
 
-    test_data = XT.values.T
-    test_features = np.array(test_data[:,:-1], dtype=float)
+# nearest_neighbours
+# Purpose: Given a matrix of distances (from every testing sample to
+#          all training samples), find the k nearest training samples
+#          of every testing sample
+# Parameters: dists - a 2-D array of float numbers, row i holding the
+#                     distances from testing sample i to all training
+#                     samples
+#             k_value - the number of neighbours to find
+# Returns: a 2-D array of column indices of dists, row i holding the
+#          k nearest training samples of testing sample i, nearest
+#          first
+# Note: ties are broken deterministically. When several training
+#       samples are at the distance of the k-th neighbour, the ones
+#       that come first (lowest column) are the neighbours, and
+#       neighbours at the same distance are ordered by column.
+def nearest_neighbours(dists, k_value):
+    k_value = min(k_value, dists.shape[1])
 
-    return train_features, train_labels, test_features
+    # the neighbours are the samples closer than the k-th smallest
+    # distance of the row, plus the first samples at that distance
+    kth = np.partition(dists, k_value - 1, axis=1)[:, k_value - 1:k_value]
+    closer = dists < kth
+    tied = dists == kth
+    num_tied = k_value - closer.sum(axis=1, keepdims=True)
+    neighbours = closer | (tied & (np.cumsum(tied, axis=1) <= num_tied))
+
+    near_idx = np.nonzero(neighbours)[1].reshape(len(dists), k_value)
+    near_dists = np.take_along_axis(dists, near_idx, axis=1)
+    order = np.argsort(near_dists, axis=1, kind='stable')
+    return np.take_along_axis(near_idx, order, axis=1)
+
+# knn_vote
+# Purpose: Decide the label of every testing sample by majority vote
+#          of its neighbours
+# Parameters: neighbours - a 2-D array, row i holding the indices of
+#                          the training samples that are neighbours of
+#                          testing sample i
+#             labels - an array of labels of the training samples
+# Returns: an array of the decided labels, one per testing sample
+# Note: when several labels get the most votes, the one that sorts
+#       first wins (as scipy.stats.mode did)
+def knn_vote(neighbours, labels):
+    uniq_labels, label_codes = np.unique(labels, return_inverse=True)
+    neighbour_codes = label_codes[neighbours]
+    # votes[i, l] is the number of neighbours of sample i with label l
+    votes = (neighbour_codes[:, :, None] == np.arange(len(uniq_labels))).sum(axis=1)
+    return uniq_labels[np.argmax(votes, axis=1)]
 
 # knn_decider
-# Purpose: Given an array of distances (from a testing sample to all 
-#          training samples) and an array of labels of the training
-#          samples, decide whether that testing samples belongs to
-#          which label according to the k_value and majority vote 
-# Parameters: dists - an array of float numbers representing the 
-#                     distances from a testing sample to all 
-#                     training samples 
+# Purpose: Given a matrix of distances (from every testing sample to
+#          all training samples) and an array of labels of the training
+#          samples, decide which label every testing sample belongs to
+#          according to the k_value and majority vote
+# Parameters: dists - a 2-D array of float numbers, row i holding the
+#                     distances from testing sample i to all training
+#                     samples
 #             labels - an array of labels of the training samples
 #             k_value - the number of neighbours one set for the 
 #                       classifier
-# Returns: the decided label for the testing sample
+# Returns: an array of the decided labels, one per testing sample
+# Note: ties are broken as in nearest_neighbours and knn_vote
 def knn_decider(dists, labels, k_value):
-    knns = []
-    for i in range(k_value):
-        knns.append((dists[i], labels[i]))
-        knns.sort()
-
-    for i in range(k_value,len(dists)):
-        index = k_value
-        while index >= 1 and dists[i] < knns[index-1][0]:
-            index -= 1
-        if index != k_value:
-            knns.insert(index, (dists[i], labels[i]))
-            knns.pop(k_value)
-
-    labels = []
-    for pairs in knns:
-        labels.append(pairs[1])
-        
-    return stats.mode(labels)[0][0]
+    return knn_vote(nearest_neighbours(dists, k_value), labels)
+
+# knn_neighbours
+# Purpose: Find the k nearest training samples of every testing sample
+#          without holding all the distances at once
+# Parameters: train_features - features of the training samples
+#             test_features - features of the testing samples
+#             k_value - the number of neighbours to find
+#             max_bytes - the most bytes of distances computed at once
+# Returns: a 2-D array of indices of training samples, row i holding
+#          the k nearest training samples of testing sample i, nearest
+#          first, with ties broken as in nearest_neighbours
+# Note: distances are first estimated squared, as |a|^2 + |b|^2 - 2a.b,
+#       so every block of distances is one matrix product with the
+#       norms of the training samples computed once. Features are
+#       centered on the training mean first, which leaves distances
+#       unchanged but keeps the subtraction from losing precision. The
+#       estimates are only off by rounding, within a margin of every
+#       testing sample, so the training samples that may be among the
+#       k nearest are the ones estimated within the margin of the k-th
+#       nearest; their distances are computed again from the original
+#       features, as in pair_distances, and ranked with the k nearest
+#       found so far, ties going to the first training samples. Blocks
+#       cover a few testing samples and, when the training set is
+#       large, a range of training samples.
+def knn_neighbours(train_features, test_features, k_value, max_bytes=block_bytes):
+    center = train_features.mean(axis=0, dtype=np.float64)
+    train_centered = train_features - center
+    train_norms = np.einsum('ij,ij->i', train_centered, train_centered)
+    num_train = len(train_features)
+    k_value = min(k_value, num_train)
+    # rounding bound of the estimates, relative to the squared norms
+    rounding = 4 * train_centered.shape[1] * np.finfo(np.float64).eps
+    max_norm = train_norms.max(initial=0)
+
+    # as many training samples per block as fit with 64 testing samples
+    cols = max(min(num_train, max_bytes // (8 * 64)), k_value, 1)
+    rows = max(max_bytes // (8 * cols), 1)
+
+    neighbours = np.zeros((len(test_features), k_value), dtype=np.int64)
+    for row in range(0, len(test_features), rows):
+        test_block = test_features[row:row + rows] - center
+        test_norms = np.einsum('ij,ij->i', test_block, test_block)
+        margin = rounding * (test_norms + max_norm)
+        best_dists = np.zeros((len(test_block), 0))
+        best_idx = np.zeros((len(test_block), 0), dtype=np.int64)
+        for col in range(0, num_train, cols):
+            dists = test_block @ train_centered[col:col + cols].T
+            dists *= -2
+            dists += test_norms[:, None]
+            dists += train_norms[None, col:col + cols]
+            np.maximum(dists, 0, out=dists)
+
+            # the k-th nearest is at most the k-th smallest of the exact
+            # distances so far and the estimates plus the margin
+            bounds = np.concatenate((best_dists, dists + margin[:, None]), axis=1)
+            limit = np.partition(bounds, k_value - 1, axis=1)[:, k_value - 1]
+            cand_rows, cand_cols = np.nonzero(dists <= (limit + margin)[:, None])
+            cand_cols += col
+            cand_dists = pair_distances(test_features, train_features, row + cand_rows,
+                                        cand_cols, max_bytes)
+
+            all_rows = np.concatenate((np.repeat(np.arange(len(test_block)), best_idx.shape[1]),
+                                       cand_rows))
+            all_idx = np.concatenate((best_idx.ravel(), cand_cols))
+            all_dists = np.concatenate((best_dists.ravel(), cand_dists))
+            order = np.lexsort((all_idx, all_dists, all_rows))
+            starts = np.searchsorted(all_rows[order], np.arange(len(test_block)))
+            keep = order[starts[:, None] + np.arange(k_value)]
+            best_dists = all_dists[keep]
+            best_idx = all_idx[keep]
+        neighbours[row:row + rows] = best_idx
+    return neighbours
 
 # knn_predict
 # Purpose: Predict an array of testing samples' labels given
@@ -80,13 +179,98 @@ def knn_decider(dists, labels, k_value):
 #             test_features - features of the testing samples
 #             k-value - hyper parameter of num of neighbours to 
 #                       check
+#             max_bytes - the most bytes of distances computed at once
 # Returns: an array of labels for the testing samples 
-def knn_predict(train_features, train_labels, test_features, k_value):
-    all_dists = distance.cdist(test_features, train_features, 'euclidean')
-    predictions = []
-    for i in range(len(test_features)):
-        predictions.append(knn_decider(all_dists[i],train_labels,k_value))
-    return predictions
+def knn_predict(train_features, train_labels, test_features, k_value, max_bytes=block_bytes):
+    neighbours = knn_neighbours(train_features, test_features, k_value, max_bytes)
+    return knn_vote(neighbours, train_labels)
+
+# train_distances
+# Purpose: Compute the squared distances between all pairs of samples
+# Parameters: features - features of the samples
+# Returns: a 2-D array, entry (i, j) holding the squared distance
+#          between samples i and j
+# Note: computed as |a|^2 + |b|^2 - 2a.b on features centered on their
+#       mean, like the blocks of knn_neighbours
+def train_distances(features):
+    centered = features - features.mean(axis=0, dtype=np.float64)
+    norms = np.einsum('ij,ij->i', centered, centered)
+    dists = centered @ centered.T
+    dists *= -2
+    dists += norms[:, None]
+    dists += norms[None, :]
+    return np.maximum(dists, 0, out=dists)
+
+# make_folds
+# Purpose: Split samples into folds of consecutive samples
+# Parameters: num_samples - the number of samples
+#             fold_size - the number of samples in a fold, 1 for
+#                         leave-one-out
+# Returns: an array of the fold of every sample
+# Note: when fold_size does not divide num_samples, the last fold holds
+#       the remaining samples
+def make_folds(num_samples, fold_size):
+    return np.arange(num_samples) // fold_size
+
+# fold_k_values
+# Purpose: Find the k-values cross-validation can use with some folds
+# Parameters: k_values - a list of k-values
+#             folds - the fold of every sample, as given by make_folds
+# Returns: an array of the k-values, those larger than the number of
+#          samples outside the largest fold being cut down to it
+def fold_k_values(k_values, folds):
+    num_outside = len(folds) - np.bincount(folds).max()
+    return np.minimum(np.asarray(k_values), num_outside)
+
+# cv_predict
+# Purpose: Predict the label of every sample from the samples outside
+#          its fold, for several k-values at once
+# Parameters: dists - a 2-D array of the distances between all pairs
+#                     of samples, as given by train_distances
+#             labels - labels of the samples
+#             k_values - a list of k-values
+#             folds - the fold of every sample, as given by make_folds
+# Returns: a 2-D array, row j holding the predicted labels of all
+#          samples for k_values[j]
+# Note: the neighbours of every sample are sorted once, up to the
+#       largest k-value, and the votes for all k-values are running
+#       sums over them. Neighbours and ties are as in knn_predict with
+#       the other folds as training samples; k-values are cut down as
+#       in fold_k_values.
+def cv_predict(dists, labels, k_values, folds):
+    dists = np.where(folds[:, None] == folds[None, :], np.inf, dists)
+    k_values = fold_k_values(k_values, folds)
+    neighbours = nearest_neighbours(dists, int(k_values.max()))
+
+    uniq_labels, label_codes = np.unique(labels, return_inverse=True)
+    # votes[i, j, l] is the number of samples with label l among the
+    # j + 1 nearest neighbours of sample i
+    votes = np.cumsum(label_codes[neighbours][:, :, None] == np.arange(len(uniq_labels)),
+                      axis=1)
+    return uniq_labels[np.argmax(votes[:, k_values - 1], axis=2)].T
+
+# cross_validate
+# Purpose: Measure the accuracy of the classifier for several k-values
+#          and fold sizes, from one distance matrix
+# Parameters: features - features of the labeled samples
+#             labels - labels of the labeled samples
+#             k_values - a list of k-values
+#             fold_sizes - a list of fold sizes, 1 for leave-one-out
+# Returns: a dict from every fold size to a pair of arrays, the k-values
+#          used and the accuracy for every one of them
+# Note: k-values too large for the folds are cut down as in
+#       fold_k_values, and a k-value is used once even when several are
+#       cut down to it
+def cross_validate(features, labels, k_values, fold_sizes=(1,)):
+    dists = train_distances(features)
+    accuracies = {}
+    for fold_size in fold_sizes:
+        folds = make_folds(len(features), fold_size)
+        used_k_values = np.unique(fold_k_values(k_values, folds))
+        predicted = cv_predict(dists, labels, used_k_values, folds)
+        accuracies[fold_size] = (used_k_values,
+                                 (predicted == np.asarray(labels)).mean(axis=1))
+    return accuracies
 
 # x_validation
 # Purpose: Cross-validate the algorithm given a set of labeled samples
@@ -94,19 +278,11 @@ def knn_predict(train_features, train_labels, test_features, k_value):
 #             labels - labels of the labeled samples
 #             k-value - hyper parameter of num of neighbours to 
 #                       check
+#             fold_size - the number of samples in a fold
 # Returns: an array of labels for the samples
-def x_validation(features, labels, k_value):
-    fold_size = 6
-    predicted = []
-    numItr = int(len(features) / fold_size)
-    for i in range(numItr):
-        currTrain = np.delete(features, range(i * fold_size, i * fold_size + fold_size), axis=0)
-        currLabels = np.delete(labels, range(i * fold_size, i * fold_size + fold_size))
-        currTest = np.take(features, range(i * fold_size, i * fold_size + fold_size), axis=0)
-        curr_prediction = knn_predict(currTrain, currLabels, currTest, k_value)
-        predicted.append(curr_prediction)
-    result = np.array(predicted).reshape(1,-1)[0]
-    return result
+def x_validation(features, labels, k_value, fold_size=6):
+    folds = make_folds(len(features), fold_size)
+    return cv_predict(train_distances(features), labels, [k_value], folds)[0]
 
 # calc_accuracy
 # Purpose: Calculate the accuracy of prediction given ground truth
@@ -123,26 +299,67 @@ def calc_accuracy(predicted, true_labels):
 
 
 if __name__ == "__main__":
+    # settings of the index of the ann mode, each given as an option
+    # followed by a number
+    ann_options = {}
+    for option, name in (("--dims", "dims"), ("--trees", "num_trees"),
+                         ("--leaf", "leaf_size"), ("--shortlist", "shortlist")):
+        if option in sys.argv[:-1]:
+            pos = sys.argv.index(option)
+            ann_options[name] = int(sys.argv[pos + 1])
+            del sys.argv[pos:pos + 2]
+    shortlist = ann_options.pop("shortlist", None)
+
     if len(sys.argv) != 5:
-        print("Usage: python3 knn-classifier.py [TRAIN.txt] [TEST.txt] [K-VALUE] [test/xv]")
+        print("Usage: python3 knn-classifier.py [TRAIN.txt] [TEST.txt] [K-VALUE] [test/xv/ann/cv]"
+              " (--dims N) (--trees N) (--leaf N) (--shortlist N)")
+        exit(1)
+    train_fname, test_fname = sys.argv[1], sys.argv[2]
+    # a comma-separated list of k-values is swept by the cv mode
+    k_vals = [int(k) for k in sys.argv[3].split(",")]
+    k_val = k_vals[0]
+    if len(k_vals) > 1 and sys.argv[4] != "cv":
+        print("Several k-values are only supported in 'cv' mode")
         exit(1)
-    train_fname, test_fname, k_val = sys.argv[1], sys.argv[2], int(sys.argv[3])
-    train_features, train_labels, test_features = get_data(train_fname, test_fname)
+    train_features, train_labels, train_headers = load_matrix(train_fname)
+    test_features, test_labels, test_headers = load_matrix(test_fname)
     modeProgram = sys.argv[4]
     if modeProgram == "test":
         predicted_labels = knn_predict(train_features, train_labels, test_features, k_val)
-        test_headers = pd.read_csv(sys.argv[2], nrows=1, delimiter='\t').columns.to_list()
         for i in range(len(test_features)):
             print(test_headers[i], predicted_labels[i])
+    elif modeProgram == "ann":
+        # predict with the approximate index, and report on stderr how
+        # it compares with the exact neighbours and predictions
+        index = annIndex(train_features, **ann_options)
+        neighbours = index.query(test_features, k_val, shortlist)
+        predicted_labels = knn_vote(neighbours, train_labels)
+        for i in range(len(test_features)):
+            print(test_headers[i], predicted_labels[i])
+        exact_neighbours = knn_neighbours(train_features, test_features, k_val)
+        print("neighbour recall:", neighbour_recall(neighbours, exact_neighbours), file=sys.stderr)
+        print("labels matching knn_predict:",
+              calc_accuracy(predicted_labels, knn_vote(exact_neighbours, train_labels)),
+              file=sys.stderr)
+    elif modeProgram == "cv":
+        # accuracy of every k-value for leave-one-out and for folds of
+        # 6 samples, from one distance matrix
+        accuracies = cross_validate(train_features, train_labels, k_vals, (1, 6))
+        print("folds", "k", "accuracy")
+        # the k-values printed are the ones used, which are smaller than
+        # the ones asked for when the folds leave too few samples
+        for fold_size, (fold_k_vals, fold_accuracies) in accuracies.items():
+            for k, accuracy in zip(fold_k_vals, fold_accuracies):
+                print("loo" if fold_size == 1 else fold_size, k, accuracy)
     elif modeProgram == "xv":
         vldrst = x_validation(train_features, train_labels, k_val)
-        test_headers_vld = pd.read_csv(sys.argv[1], nrows=1, delimiter='\t').columns.to_list()
         for i in range(len(train_labels)):
-            print(test_headers_vld[i], vldrst[i])
+            print(train_headers[i], vldrst[i])
         # Uncomment the following line for printing the accuracy rate of
         # Cross-validation predicted labels corresponding to the features
         # of the training samples 
 
         # print(calc_accuracy(vldrst, train_labels))
     else:
-        print("Unsupported Mode, please use 'test' for prediction or 'xv' for cross-validation")
\ No newline at end of file
+        print("Unsupported Mode, please use 'test' for prediction, 'ann' for approximate "
+              "prediction, 'xv' for cross-validation or 'cv' for the accuracy of k-values")
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+test_knn.py
+
+Description: Checks that the blocked neighbour search of
+knn-classifier.py gives exact ties to the first training samples, like
+a stable sort of the exact distances.
+
+Usage: python3 -m pytest test_knn.py
+"""
+import importlib.util
+import os
+import numpy as np
+
+spec = importlib.util.spec_from_file_location(
+    'knn_classifier', os.path.join(os.path.dirname(__file__), 'knn-classifier.py'))
+knn = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(knn)
+
+# test_neighbour_ties
+# Purpose: Compare knn_neighbours with a stable sort of exact distances
+#          on features with many tied distances, far from the origin so
+#          that |a|^2 + |b|^2 - 2a.b rounds them apart
+def test_neighbour_ties():
+    rng = np.random.default_rng(0)
+    for trial in range(30):
+        num_train, num_test, dims = rng.integers(5, 400), rng.integers(1, 50), rng.integers(1, 6)
+        scale = rng.choice([1, 1e3, 1e6])
+        train = rng.integers(0, 3, (num_train, dims)) * scale + rng.choice([0, 1e7])
+        test = rng.integers(0, 3, (num_test, dims)) * scale + rng.choice([0, 1e7])
+        k_value = int(rng.integers(1, min(num_train, 30) + 1))
+        exact = ((test[:, None, :] - train[None, :, :]) ** 2).sum(axis=2)
+        expected = np.argsort(exact, axis=1, kind='stable')[:, :k_value]
+        for max_bytes in [knn.block_bytes, 2000, 64]:
+            found = knn.knn_neighbours(train, test, k_value, max_bytes)
+            assert (found == expected).all()
@@ -0,0 +1,84 @@
+"""
+assemblyStats.py
+
+Description: Summary statistics of the contigs of an assembly (number,
+    total and longest length, N50, L50, NG50 and LG50), computed from
+    contig lengths in memory. Lengths are gathered in a histogram, so
+    they can also be added in chunks, e.g. while reading a file of
+    millions of lengths, in memory bounded by the longest contig.
+"""
+
+import numpy as np
+
+
+# Class definition for a histogram of contig lengths
+class lengthHistogram:
+    def __init__(self):
+        # counts[n] is the number of contigs of length n
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    # Method for adding contig lengths
+    # Parameter: lengths: an array of contig lengths
+    # Returns: N/A
+    def add(self, lengths):
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if len(lengths) == 0:
+            return
+        if lengths.min() < 0:
+            raise ValueError("contig lengths must not be negative")
+        counts = np.bincount(lengths)
+        if len(counts) > len(self.counts):
+            self.counts = np.concatenate(
+                (self.counts, np.zeros(len(counts) - len(self.counts), dtype=np.int64)))
+        self.counts[:len(counts)] += counts
+
+    # Method for the statistics of the contigs added so far
+    # Parameter: genomeSize: the (estimated) length of the genome, for
+    #                        NG50 and LG50, None if unknown
+    # Returns: a dict with numContigs, totalLength, maxLength, n50,
+    #          l50, and ng50 and lg50 when genomeSize is given
+    # Note: N50 is the length of the shortest contig among the longest
+    #       ones that together cover half of the total length, and L50
+    #       is the number of these contigs; NG50 and LG50 are the same
+    #       for half of the genome, and are 0 when the contigs do not
+    #       cover that much
+    def stats(self, genomeSize=None):
+        # longest lengths first, with the length and number of the
+        # contigs covered up to every length
+        sizes = np.flatnonzero(self.counts)[::-1]
+        numSizes = self.counts[sizes]
+        covered = np.cumsum(sizes * numSizes)
+        numCovered = np.cumsum(numSizes)
+
+        # nx
+        # Purpose: finds the contigs covering half of a length
+        # Parameter: length: the length to cover half of
+        # Returns: a (shortest contig length, number of contigs) pair
+        def nx(length):
+            idx = int(np.searchsorted(covered * 2, length))
+            if length <= 0 or idx == len(sizes):
+                return 0, 0
+            before = covered[idx] - sizes[idx] * numSizes[idx]
+            needed = -(-(length - before * 2) // (sizes[idx] * 2))
+            return int(sizes[idx]), int(numCovered[idx] - numSizes[idx] + max(needed, 1))
+
+        total = int(covered[-1]) if len(sizes) > 0 else 0
+        result = {"numContigs": int(numCovered[-1]) if len(sizes) > 0 else 0,
+                  "totalLength": total,
+                  "maxLength": int(sizes[0]) if len(sizes) > 0 else 0}
+        result["n50"], result["l50"] = nx(total)
+        if genomeSize is not None:
+            result["ng50"], result["lg50"] = nx(genomeSize)
+        return result
+
+
+# contigStats
+# Purpose: computes the statistics of contigs
+# Parameters: lengths: an array of contig lengths
+#             genomeSize: the (estimated) length of the genome, for
+#                         NG50 and LG50, None if unknown
+# Returns: the dict of lengthHistogram.stats
+def contigStats(lengths, genomeSize=None):
+    histogram = lengthHistogram()
+    histogram.add(lengths)
+    return histogram.stats(genomeSize)
@@ -1,227 +1,1336 @@
-"""
-deBruijnGraph.py
-
-Description: An implementation of a simplified version
-of sequence assembly using de Bruijn graphs. Two modes 
-can be used by the user, mode 'g' produces a filtered 
-good_reads file that contains all reads that are consisted 
-of k-mers which appear more than once; and mode 'c' produces
-assembled non-ambiguious contigs 
-    
-Created by Etha Hua, March 14 2022
-"""
-
-import sys
-
-
-# Class definition of a de-Bruijn-graph node
-class graphNode:
-    def __init__(self, value):
-        self.val = value
-        self.outgo = []
-        self.ingo = []
-        self.visited = False
-        self.branch = False
-        self.count = 1
-    
-    # Method for adding an outgoing node of a node
-    def out_edge(self, value):
-        self.outgo.append(value)
-
-    # Method for adding an ingoing node of a node
-    def in_edge(self, value):
-        self.ingo.append(value)
-
-# Class definition for a de Bruijn graph
-class deBruijnGraph:
-    def __init__(self):
-        self.nodes = dict()
-
-    # Method for building the graph
-    # Parameters: fstream: the input file stream that contains
-    #                      reads to be incorporated into the graph
-    #             kval: k value, the length of a k-mer in the graph
-    # Returns: N/A
-    # Note: it updates the graph that has been called upon
-    def buildGraph(self, fstream, kval):
-        for line in fstream:
-            numLoop = len(line) - kval
-            for i in range(0, numLoop):
-                kmer = line[i:i+kval]
-                self.addNode(kmer)
-                if i > 0 and i < numLoop - 1:
-                    self.addInEdge(kmer, line[i - 1:i + kval - 1])
-                    self.addOutEdge(kmer, line[i + 1:i + kval + 1])
-                elif i == 0:
-                    self.addOutEdge(kmer, line[i + 1:i + kval + 1])
-                else: # i == numLoop - 1
-                    self.addInEdge(kmer, line[i - 1:i + kval - 1])
-
-    # Method for adding a node to the graph
-    # Parameter: valNode: the value of the node to be added
-    # Returns: N/A
-    # Note: if that node value already exists in the graph,
-    #       the node will be incremented its count by 1
-    def addNode(self, valNode):
-        if self.nodes.get(valNode) is not None:
-            self.nodes[valNode].count += 1
-        else:
-            self.nodes[valNode] = graphNode(valNode)
-    
-    # Method for adding an ingoing edge to an existing node
-    # Parameter: valNode: the value of the node for which an in 
-    #            going edge is to be added;
-    #            inValNode: the value of the node which the 
-    #            ingoing edge is leading to
-    # Note: it also keeps track of the branchiness of the node
-    def addInEdge(self, valNode, inValNode):
-        if inValNode not in self.nodes[valNode].ingo:
-            self.nodes[valNode].ingo.append(inValNode)
-        if len(self.nodes[valNode].ingo) > 1:
-            self.nodes[valNode].branch = True
-    
-    # Method for adding an outgoing edge to an existing node
-    # Parameter: valNode: the value of the node for which an out 
-    #            going edge is to be added;
-    #            outValNode: the value of the node which the 
-    #            outgoing edge is leading to
-    # Note: it also keeps track of the branchiness of the node
-    def addOutEdge(self, valNode, outValNode):
-        if outValNode not in self.nodes[valNode].outgo:
-            self.nodes[valNode].outgo.append(outValNode)
-        if len(self.nodes[valNode].outgo) > 1:
-            self.nodes[valNode].branch = True
-    
-    # Method for removing all branching nodes in the graph,
-    #        including their adjacent edges.
-    def removeBranchingNodes(self):
-        toremove = []
-        for node in self.nodes:
-            currNode = self.nodes[node]
-            if currNode.branch:
-                for inNode in currNode.ingo:
-                    self.nodes[inNode].outgo.remove(currNode.val)
-                for outNode in currNode.outgo:
-                    self.nodes[outNode].ingo.remove(currNode.val)
-                toremove.append(currNode.val)
-        for bNode in toremove:
-            self.nodes.pop(bNode)
-
-    # Method for reading one contig off the de Bruijn graph, and mark
-    # all the visited nodes as visited
-    # Parameter: the node value of a node to start the path (contig)
-    # Returns: a string representing the current contig read off the graph
-    def readOneContig(self, start):
-        currContig = start
-        currNode = self.nodes[start]
-        currNode.visited = True
-        
-        while(len(currNode.outgo) == 1 and not self.nodes[currNode.outgo[0]].visited):
-            currNode = self.nodes[currNode.outgo[0]]
-            currNode.visited = True
-            currContig += currNode.val[-1]
-
-        return currContig
-
-
-    # Method for finding all the contigs in the de Bruijn Graph
-    # Parameter: minLen: the minimum length of a contig that makes it 
-    #                    an acceptable contig to be reported
-    # Returns: an array of all contigs (strings)
-    def findContigs(self, minLen):
-        contigs = []
-        for node in self.nodes:
-            currNode = self.nodes[node]
-            if len(currNode.ingo) == 0:
-                currContig = self.readOneContig(currNode.val)
-                if len(currContig) >= minLen:
-                    contigs.append(currContig)
-        for node in self.nodes:
-            currNode = self.nodes[node]
-            if not currNode.visited:
-                currContig = self.readOneContig(currNode.val)
-                if len(currContig) >= minLen:
-                    contigs.append(currContig)
-        return contigs
-
-    # Method for printing all good reads, which is defined as 
-    # containing all the k-mers that is not unique among all 
-    # other reads
-    # Parameter: reads: a fstream that contains all the original
-    #                   reads sequences
-    #            kval: the value of k, the length of a k-mer
-    # Note: this function prints all the good reads to a file
-    #       called "good_reads"
-    def printGoodReads(self, reads, kval):
-        original_stdout = sys.stdout 
-
-        with open('good_reads', 'w') as f:
-            sys.stdout = f 
-            for read in reads:
-                numLoop = len(read) - kval
-                toPrint = True
-                for i in range(0, numLoop):
-                    kmer = read[i:i+kval]
-                    if self.nodes[kmer].count <= 1:
-                        toPrint = False
-                        break
-                if toPrint:
-                    print(read[:-1])
-        sys.stdout = original_stdout # restore the original stdout
-
-
-
-# outputContigs
-# Purpose: printing out contigs and lengths of contigs to 
-#          "output_contigs" and "contig_lengths" respectively
-# Parameter: contigs: an array of the contigs to be printed
-def outputContigs(contigs):
-    
-    original_stdout = sys.stdout 
-
-    with open('output_contigs', 'w') as f:
-        sys.stdout = f 
-        for contig in contigs:
-            print(contig)
-
-    with open('contig_lengths', 'w') as f:
-        sys.stdout = f 
-        for contig in contigs:
-            print(len(contig))       
-        
-    sys.stdout = original_stdout # restore the original stdout
-    
-
-# Main function starts here
-if __name__ == "__main__":
-
-    if len(sys.argv) < 4:
-        print("Too few arguments.")
-        exit()
-    elif len(sys.argv) > 5:
-        print("Too many arguments.")
-        exit()
-    elif sys.argv[2] != "g" and sys.argv[2] != "c":
-        print("Mode not supported.")
-        exit()
-
-    # set the length of a k-mer
-    kval = int(sys.argv[3])
-
-    fname = sys.argv[1]
-    fstream = open(fname, "r")
-    myGraph = deBruijnGraph()
-    myGraph.buildGraph(fstream, kval)
-
-
-    if sys.argv[2] == "g":
-        fstream = open(fname, "r")
-        myGraph.printGoodReads(fstream, kval)
-    else: # sys.argv[2] == "c"
-        # set the minimum contig length to filter out short contigs
-        mincLength = 100
-        if len(sys.argv) == 5:
-            mincLength = int(sys.argv[4])
-        myGraph.removeBranchingNodes()
-        contigs = myGraph.findContigs(mincLength)
-        outputContigs(contigs)
\ No newline at end of file
+"""
+deBruijnGraph.py
+
+Description: An implementation of a simplified version
+of sequence assembly using de Bruijn graphs. Two modes 
+can be used by the user, mode 'g' produces a filtered 
+good_reads file that contains all reads that are consisted 
+of k-mers which appear more than once; and mode 'c' produces
+assembled non-ambiguious contigs 
+
+Created by Etha Hua, March 14 2022
+"""
+
+import json
+import os
+import struct
+import sys
+from functools import partial
+from multiprocessing import Pool
+import numpy as np
+from assemblyStats import contigStats
+from kmerSketch import scalableBloomFilter
+from readStream import (batchSize, fileChecksum, rawBatches, readBatches,
+                        readsFormat, shardBatches)
+
+
+# Largest k value that fits a k-mer in a 64-bit integer
+maxKval = 32
+
+# Most bytes of reads kept in memory in mode "g" for finding the good
+# reads without reading the file again
+keptReadsBytes = 1 << 30
+
+# Lookup table of the 2-bit codes of A, C, G and T; any other
+# character gets 4 and cannot be part of a k-mer
+baseLetters = "ACGT"
+baseCodes = np.full(256, 4, dtype=np.uint8)
+for code in range(4):
+    baseCodes[ord(baseLetters[code])] = code
+
+# Layout of the header of a graph index file: magic bytes, k value,
+# flags (1 for a canonical graph), number of k-mers, and the size,
+# modification time and checksum of the reads file it was built from.
+# The header is followed by the kmers, first, counts and edges arrays,
+# little-endian, so that every array starts aligned to its item size.
+indexMagic = b"DBGIDX01"
+indexHeader = struct.Struct("<8sIIQQq32s")
+indexArrays = [("kmers", "<u8"), ("first", "<i8"), ("counts", "<u4"), ("edges", "u1")]
+
+# Number of edges and the base of the single edge of every 4-bit
+# edge mask (the low 4 bits of a mask are the outgoing edges, by the
+# last base of the next k-mer, and the high 4 bits are the ingoing
+# edges, by the first base of the previous k-mer)
+edgeCounts = np.array([bin(m).count("1") for m in range(16)], dtype=np.uint8)
+edgeBases = np.array([max(m.bit_length() - 1, 0) for m in range(16)], dtype=np.uint8)
+
+
+# encodeKmer
+# Purpose: packs a k-mer string into a 2-bit integer
+# Parameter: kmer: the k-mer string (made of A, C, G and T)
+# Returns: the packed integer, with the first base in the highest bits
+def encodeKmer(kmer):
+    value = 0
+    for letter in kmer:
+        value = (value << 2) | baseLetters.index(letter)
+    return value
+
+
+# decodeKmer
+# Purpose: unpacks a 2-bit integer into its k-mer string
+# Parameters: value: the packed k-mer
+#             kval: k value, the length of a k-mer
+# Returns: the k-mer string
+def decodeKmer(value, kval):
+    value = int(value)
+    letters = []
+    for i in range(kval):
+        letters.append(baseLetters[(value >> (2 * (kval - 1 - i))) & 3])
+    return "".join(letters)
+
+
+# Shifts and masks swapping the halves of ever larger groups of bits
+# of a 64-bit integer, from pairs of 2-bit bases to the whole word
+reverseSteps = [(np.uint64(2 << i), np.uint64(m)) for i, m in
+                enumerate([0x3333333333333333, 0x0F0F0F0F0F0F0F0F,
+                           0x00FF00FF00FF00FF, 0x0000FFFF0000FFFF,
+                           0x00000000FFFFFFFF])]
+
+
+# reverseComplement
+# Purpose: computes the reverse complements of packed k-mers
+# Parameters: kmers: a uint64 array of packed k-mers
+#             kval: k value, the length of a k-mer
+# Returns: the uint64 array of the packed reverse complements
+# Note: the bases are reversed by swapping bit groups and complemented
+#       by inverting their bits (A, C, G, T are 0, 1, 2, 3)
+def reverseComplement(kmers, kval):
+    values = np.asarray(kmers, dtype=np.uint64)
+    for shift, mask in reverseSteps:
+        values = ((values >> shift) & mask) | ((values & mask) << shift)
+    return ~values >> np.uint64(64 - 2 * kval)
+
+
+# canonicalKmers
+# Purpose: maps packed k-mers to their canonical k-mers, the smaller of
+#          a k-mer and its reverse complement
+# Parameters: kmers: a uint64 array of packed k-mers
+#             kval: k value, the length of a k-mer
+# Returns: (canonical, flipped) arrays where flipped tells whether the
+#          canonical k-mer is the reverse complement
+def canonicalKmers(kmers, kval):
+    rc = reverseComplement(kmers, kval)
+    return np.minimum(kmers, rc), rc < kmers
+
+
+# lineBatches
+# Purpose: groups the lines of a stream into batches of reads
+# Parameters: fstream: any iterable of lines (str or bytes), one read
+#                      per line
+#             offset: the position of the first line
+# Returns: a generator yielding (reads, position of the first read)
+#          pairs like readBatches, positions counting the characters
+#          of all lines
+def lineBatches(fstream, offset=0):
+    return rawBatches(lineChunks(fstream, offset))
+
+
+# lineChunks
+# Purpose: joins the lines of a stream into chunks of about batchSize
+#          characters
+# Parameters: fstream: any iterable of lines (str or bytes)
+#             offset: the position of the first line
+# Returns: a generator yielding (chunk, position of the chunk) pairs,
+#          chunks being ASCII bytes (other characters become "?")
+def lineChunks(fstream, offset=0):
+    batch = []
+    size = 0
+    for line in fstream:
+        batch.append(line)
+        size += len(line)
+        if size >= batchSize:
+            yield joinLines(batch), offset
+            offset += size
+            batch = []
+            size = 0
+    if len(batch) > 0:
+        yield joinLines(batch), offset
+
+
+# joinLines
+# Purpose: joins lines into one chunk of bytes
+# Parameter: lines: a non-empty list of str or bytes lines
+# Returns: the joined bytes
+def joinLines(lines):
+    if isinstance(lines[0], str):
+        return "".join(lines).encode("ascii", "replace")
+    return b"".join(lines)
+
+
+# fileShards
+# Purpose: splits a file into byte ranges starting at line starts
+# Parameters: fname: the file name
+#             numShards: the number of ranges
+# Returns: a list of (start, end) byte positions
+def fileShards(fname, numShards):
+    size = os.path.getsize(fname)
+    bounds = [0]
+    with open(fname, "rb") as f:
+        for i in range(1, numShards):
+            pos = size * i // numShards
+            if pos > bounds[-1]:
+                # move to the start of the line after byte pos - 1
+                f.seek(pos - 1)
+                f.readline()
+                pos = f.tell()
+            bounds.append(max(pos, bounds[-1]))
+    bounds.append(size)
+    return [(bounds[i], bounds[i + 1]) for i in range(numShards)]
+
+
+# packKmerSweep
+# Purpose: packs every k-mer of a batch of reads into a 2-bit integer,
+#          for several k values in turn
+# Parameters: reads: a list of reads (byte strings)
+#             kvals: the k values, in increasing order
+# Returns: a generator yielding (kval, kmers, valid, codes, starts)
+#          for every k value, as packKmers returns them
+# Note: the k-mers of a k value are extended base by base from those
+#       of the k value before, so packing all the k values takes as
+#       many passes over the bases as the largest one does. The kmers
+#       array is overwritten when the next k value is packed.
+def packKmerSweep(reads, kvals):
+    joined = b"\n".join(reads)
+    codes = baseCodes[np.frombuffer(joined, dtype=np.uint8)]
+    lengths = np.array([len(read) + 1 for read in reads], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    # a window is valid if it has no separator or other character
+    bad = np.concatenate(([0], np.cumsum(codes == 4)))
+
+    low = (codes & 3).astype(np.uint64)
+    kmers = np.zeros(len(codes), dtype=np.uint64)
+    done = 0
+    for kval in kvals:
+        numPos = max(len(codes) - kval + 1, 0)
+        kmers = kmers[:numPos]
+        for i in range(done, kval):
+            kmers <<= np.uint64(2)
+            kmers |= low[i:i + numPos]
+        done = kval
+        valid = bad[kval:kval + numPos] == bad[:numPos]
+        yield kval, kmers, valid, codes, starts
+
+
+# packKmers
+# Purpose: packs every k-mer of a batch of reads into a 2-bit integer
+# Parameters: reads: a list of reads (byte strings)
+#             kval: k value, the length of a k-mer
+# Returns: (kmers, valid, codes, starts) where the reads are joined by a
+#          separator into codes (their base codes), kmers[p] is the
+#          k-mer starting at position p of codes, valid[p] tells whether
+#          that k-mer lies inside one read and only has A, C, G and T,
+#          and starts[r] is the position of read r in codes
+def packKmers(reads, kval):
+    return next(packKmerSweep(reads, [kval]))[1:]
+
+
+# countKmers
+# Purpose: builds the k-mer table of a batch of reads
+# Parameters: kmers, valid, codes: the output of packKmers
+#             kval: k value, the length of a k-mer
+#             offset: the position of the batch among all reads, used
+#                     to keep the order in which k-mers first appear
+#             canonical: whether a k-mer and its reverse complement are
+#                        counted as one canonical k-mer
+# Returns: (kmers, counts, edges, first) arrays of the distinct k-mers
+#          in increasing order, their counts, their edge masks and the
+#          position of their first occurrence
+# Note: edge masks are in the orientation of the canonical k-mer, so
+#       the edge of a k-mer read as its reverse complement is the
+#       opposite edge, by the complementary base. Both edges are set on
+#       a k-mer that is its own reverse complement.
+def countKmers(kmers, valid, codes, kval, offset, canonical=False):
+    flipped = np.zeros(len(kmers), dtype=bool)
+    if canonical:
+        rc = reverseComplement(kmers, kval)
+        flipped = rc < kmers
+        palindromes = np.flatnonzero(rc == kmers)
+        kmers = np.minimum(kmers, rc)
+    pos = np.flatnonzero(valid)
+    uniq, firstIdx, inverse = np.unique(kmers[pos], return_index=True,
+                                        return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(uniq))
+
+    # consecutive k-mers of a read are linked by an outgoing edge of
+    # the first one and an ingoing edge of the second one
+    posIdx = np.full(len(kmers), -1, dtype=np.int64)
+    posIdx[pos] = inverse
+    linked = np.flatnonzero(valid[:-1] & valid[1:])
+    lastBases = codes[linked + kval].astype(np.int64)
+    firstBases = codes[linked].astype(np.int64)
+    outBits = np.where(flipped[linked], 7 - lastBases, lastBases)
+    inBits = np.where(flipped[linked + 1], 3 - firstBases, 4 + firstBases)
+    keys = [posIdx[linked] * 8 + outBits, posIdx[linked + 1] * 8 + inBits]
+    if canonical:
+        isPalin = np.zeros(len(kmers) + 1, dtype=bool)
+        isPalin[palindromes] = True
+        fromPalin = isPalin[linked]
+        toPalin = isPalin[linked + 1]
+        keys.append(posIdx[linked[fromPalin]] * 8 + 7 - lastBases[fromPalin])
+        keys.append(posIdx[linked[toPalin] + 1] * 8 + 3 - firstBases[toPalin])
+    keys = np.sort(np.concatenate(keys))
+    keys = keys[np.concatenate((keys[:1] >= 0, keys[1:] != keys[:-1]))]
+    edges = np.bincount(keys >> 3, weights=1 << (keys & 7), minlength=len(uniq))
+    return uniq, counts, edges.astype(np.uint8), pos[firstIdx] + offset
+
+
+# mergeTables
+# Purpose: merges k-mer tables, adding up counts and edges
+# Parameter: tables: a list of (kmers, counts, edges, first) tables
+# Returns: the merged (kmers, counts, edges, first) table
+def mergeTables(tables):
+    if len(tables) == 1:
+        return tables[0]
+    uniq, inverse = np.unique(np.concatenate([t[0] for t in tables]),
+                              return_inverse=True)
+    counts = np.zeros(len(uniq), dtype=np.int64)
+    np.add.at(counts, inverse, np.concatenate([t[1] for t in tables]))
+    edges = np.zeros(len(uniq), dtype=np.uint8)
+    np.bitwise_or.at(edges, inverse, np.concatenate([t[2] for t in tables]))
+    first = np.full(len(uniq), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first, inverse, np.concatenate([t[3] for t in tables]))
+    return uniq, counts, edges, first
+
+
+# countBatch
+# Purpose: builds the k-mer table of one batch of reads
+# Parameters: batch: a (reads, position) pair, as given by readBatches
+#             kval: k value, the length of a k-mer
+#             canonical: whether k-mers are counted as canonical k-mers
+# Returns: the (kmers, counts, edges, first) table of the batch
+def countBatch(batch, kval, canonical=False):
+    reads, offset = batch
+    kmers, valid, codes, starts = packKmers(reads, kval)
+    return countKmers(kmers, valid, codes, kval, offset, canonical)
+
+
+# countSweepBatch
+# Purpose: builds the k-mer tables of one batch of reads for several
+#          k values
+# Parameters: batch: a (reads, position) pair, as given by readBatches
+#             kvals: the k values, in increasing order
+#             canonical: whether k-mers are counted as canonical k-mers
+# Returns: a list of the (kmers, counts, edges, first) tables of the
+#          batch, one per k value
+def countSweepBatch(batch, kvals, canonical=False):
+    reads, offset = batch
+    return [countKmers(kmers, valid, codes, kval, offset, canonical)
+            for kval, kmers, valid, codes, starts in packKmerSweep(reads, kvals)]
+
+
+# countReads
+# Purpose: builds the k-mer table of batches of reads
+# Parameters: batches: an iterable of (reads, position) pairs, as
+#                      given by readBatches
+#             kval: k value, the length of a k-mer
+#             table: a (kmers, counts, edges, first) table to add the
+#                    k-mers to, empty by default
+#             canonical: whether k-mers are counted as canonical k-mers
+# Returns: the (kmers, counts, edges, first) table
+def countReads(batches, kval, table=None, canonical=False):
+    return mergeBatchTables((countBatch(batch, kval, canonical) for batch in batches),
+                            table)
+
+
+# mergeBatchTables
+# Purpose: merges a stream of batch tables into one table
+# Parameters: tables: an iterable of (kmers, counts, edges, first)
+#                     tables
+#             table: a table to merge them into, empty by default
+# Returns: the merged (kmers, counts, edges, first) table
+def mergeBatchTables(tables, table=None):
+    merger = tableMerger(table)
+    for batchTable in tables:
+        merger.add(batchTable)
+    return merger.result()
+
+
+# Class definition for merging batch tables into one table as they
+# come, e.g. one merger per k value of a sweep
+# Note: batch tables are kept aside and merged into the table once
+#       they hold as many k-mers as the table does
+class tableMerger:
+    # Parameter: table: a table to merge into, empty by default
+    def __init__(self, table=None):
+        if table is None:
+            table = (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64),
+                     np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64))
+        self.table = table
+        self.pending = []
+        self.pendingSize = 0
+
+    # Method for adding a batch table
+    # Parameter: batchTable: a (kmers, counts, edges, first) table
+    # Returns: N/A
+    def add(self, batchTable):
+        self.pending.append(batchTable)
+        self.pendingSize += len(batchTable[0])
+        if self.pendingSize >= len(self.table[0]):
+            self.table = mergeTables([self.table] + self.pending)
+            self.pending = []
+            self.pendingSize = 0
+
+    # Method for the merged table of every batch table added so far
+    # Returns: the merged (kmers, counts, edges, first) table
+    def result(self):
+        self.table = mergeTables([self.table] + self.pending)
+        self.pending = []
+        self.pendingSize = 0
+        return self.table
+
+
+# splitTable
+# Purpose: partitions a k-mer table by a hash of the k-mers
+# Parameters: table: a (kmers, counts, edges, first) table
+#             numParts: the number of partitions
+# Returns: a list of numParts tables, each one still sorted by k-mer
+def splitTable(table, numParts):
+    hashes = (table[0] * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(40)
+    part = hashes % np.uint64(numParts)
+    return [tuple(arr[part == p] for arr in table) for p in range(numParts)]
+
+
+# countShard
+# Purpose: counts the k-mers of a byte range of a reads file, run in
+#          a worker process
+# Parameter: task: the (fname, start, end, kval, numParts, offset,
+#                  canonical) tuple of the range, offset being added to
+#                  positions
+# Returns: the k-mer table of the range split into numParts partitions
+def countShard(task):
+    fname, start, end, kval, numParts, offset, canonical = task
+    table = countReads(shardBatches(fname, start, end, offset), kval,
+                       canonical=canonical)
+    return splitTable(table, numParts)
+
+
+# goodReads
+# Purpose: selects the good reads of a batch, whose k-mers are all
+#          solid
+# Parameters: batch: a list of reads (byte strings)
+#             kval: the value of k, the length of a k-mer
+#             isSolid: a function telling for an array of packed
+#                      k-mers whether each one is solid
+# Returns: the list of good reads; a read shorter than k is good
+def goodReads(batch, kval, isSolid):
+    kmers, valid, codes, starts = packKmers(batch, kval)
+    solid = np.zeros(len(kmers) + 1, dtype=bool)
+    pos = np.flatnonzero(valid)
+    solid[pos] = isSolid(kmers[pos])
+
+    # a read is good if all its k-mers are solid
+    weak = np.concatenate(([0], np.cumsum(~solid)))
+    good = []
+    for r in range(len(batch)):
+        numLoop = len(batch[r]) - kval + 1
+        if numLoop <= 0 or weak[starts[r] + numLoop] == weak[starts[r]]:
+            good.append(batch[r])
+    return good
+
+
+# Class definition for passing batches of reads on while keeping them,
+# so that they can be gone through again without reading the file
+# Note: once the reads take more than maxBytes, none are kept any more
+#       and kept is None
+class batchKeeper:
+    # Parameters: batches: an iterable of (reads, position) pairs, as
+    #                      given by readStream.readBatches
+    #             maxBytes: the most bytes of reads kept
+    def __init__(self, batches, maxBytes):
+        self.batches = batches
+        self.maxBytes = maxBytes
+        self.kept = []
+        self.size = 0
+
+    # Method for going through the batches, keeping them on the way
+    # Returns: a generator yielding the batches
+    def __iter__(self):
+        for batch in self.batches:
+            if self.kept is not None:
+                self.size += sum(len(read) for read in batch[0])
+                if self.size <= self.maxBytes:
+                    self.kept.append(batch)
+                else:
+                    self.kept = None
+            yield batch
+
+
+# writeGoodReads
+# Purpose: prints all good reads of batches of reads, one per line, to
+#          a file called "good_reads"
+# Parameters: batches: an iterable of (reads, position) pairs, as
+#                      given by readStream.readBatches
+#             kval: the value of k, the length of a k-mer
+#             isSolid: a function telling for an array of packed
+#                      k-mers whether each one is solid
+# Returns: a (number of good reads, number of reads) pair
+def writeGoodReads(batches, kval, isSolid):
+    numGood = 0
+    numReads = 0
+    with open('good_reads', 'wb') as f:
+        for batch, offset in batches:
+            good = goodReads(batch, kval, isSolid)
+            f.write(b"".join(read + b"\n" for read in good))
+            numGood += len(good)
+            numReads += len(batch)
+    return numGood, numReads
+
+
+# filterSolidReads
+# Purpose: prints all good reads of a reads file to "good_reads" in a
+#          bounded amount of memory, telling solid k-mers apart with a
+#          counting Bloom filter instead of the exact k-mer graph
+# Parameters: fname: the name of the reads file
+#             kval: the value of k, the length of a k-mer
+#             errorRate: the target probability that a unique k-mer
+#                        is taken for a solid one
+#             numKmers: the number of distinct k-mers, to size a single
+#                       filter; by default the filter grows while it is
+#                       filled, see kmerSketch.scalableBloomFilter
+#             maxBytes: the most bytes of the filter, no bound if None
+#             canonical: whether a k-mer and its reverse complement
+#                        count as one k-mer
+# Returns: (sketch, number of good reads, number of reads), sketch
+#          being the filter filled with all k-mers of the file
+# Note: the file is read twice, once to fill the filter and once to
+#       filter the reads. Good reads of the exact filter are always good
+#       reads here; the others pass with the false-positive rate of the
+#       filter for each of their unique k-mers. A filter that grows
+#       takes a few times the memory of one sized with numKmers.
+def filterSolidReads(fname, kval, errorRate=0.01, numKmers=None, maxBytes=None,
+                     canonical=False):
+    if kval > maxKval:
+        raise ValueError("k value larger than " + str(maxKval))
+    sketch = scalableBloomFilter(errorRate, numKmers, maxBytes)
+
+    def keys(kmers):
+        return canonicalKmers(kmers, kval)[0] if canonical else kmers
+
+    def isSolid(kmers):
+        return sketch.isSolid(keys(kmers))
+
+    for batch, offset in readBatches(fname):
+        kmers, valid, codes, starts = packKmers(batch, kval)
+        sketch.add(keys(kmers[valid]))
+    numGood, numReads = writeGoodReads(readBatches(fname), kval, isSolid)
+    return sketch, numGood, numReads
+
+
+# sketchFalsePositives
+# Purpose: measures the false positives of a counting Bloom filter
+#          against the exact count <= 1 check of a de Bruijn graph
+# Parameters: graph: the de Bruijn graph of the reads
+#             sketch: the filter filled with the same reads, with
+#                     canonical k-mers if the graph has them
+#             batches: an iterable of (reads, position) pairs of the
+#                      reads
+#             kval: the value of k, the length of a k-mer
+# Returns: (rate, number of good reads of the exact check) where rate
+#          is the fraction of unique k-mers the filter takes for solid
+def sketchFalsePositives(graph, sketch, batches, kval):
+    unique = graph.kmers[graph.counts <= 1]
+    rate = np.count_nonzero(sketch.isSolid(unique)) / max(len(unique), 1)
+    numGood = 0
+    for batch, offset in batches:
+        numGood += len(goodReads(batch, kval, graph.isSolid))
+    return rate, numGood
+
+
+# sweepGraphs
+# Purpose: builds the de Bruijn graphs of several k values in a single
+#          pass over the reads
+# Parameters: batches: an iterable of (reads, position) pairs, as
+#                      given by readBatches
+#             kvals: the k values
+#             canonical: whether the graphs have canonical k-mers
+#             numWorkers: the number of processes counting batches
+# Returns: a dict from every k value to its deBruijnGraph
+# Note: every graph is the same as the one addReads builds from the
+#       same batches with its k value
+def sweepGraphs(batches, kvals, canonical=False, numWorkers=1):
+    kvals = sorted(set(kvals))
+    if len(kvals) == 0:
+        return {}
+    if kvals[-1] > maxKval:
+        raise ValueError("k value larger than " + str(maxKval))
+    mergers = [tableMerger() for kval in kvals]
+    countSweep = partial(countSweepBatch, kvals=kvals, canonical=canonical)
+    if numWorkers > 1:
+        with Pool(numWorkers) as pool:
+            for tables in pool.imap(countSweep, batches):
+                for merger, table in zip(mergers, tables):
+                    merger.add(table)
+    else:
+        for tables in map(countSweep, batches):
+            for merger, table in zip(mergers, tables):
+                merger.add(table)
+    graphs = {}
+    for kval, merger in zip(kvals, mergers):
+        graphs[kval] = deBruijnGraph(canonical)
+        graphs[kval].kval = kval
+        graphs[kval].setTable(merger.result())
+    return graphs
+
+
+# Class definition for a de Bruijn graph
+# Note: k-mers are stored as 2-bit packed integers in sorted arrays,
+#       together with their counts, an 8-bit mask of their in and out
+#       edges (see edgeCounts) and the position where they first appear,
+#       which gives the order of the nodes. A canonical graph stores
+#       every k-mer and its reverse complement as one node, the smaller
+#       of the two, and contigs are walked through nodes in both
+#       orientations: a walk state is 2 * node index + orientation, 1
+#       meaning the node is read as its reverse complement.
+class deBruijnGraph:
+    # Parameter: canonical: whether the graph has canonical k-mers
+    def __init__(self, canonical=False):
+        self.canonical = canonical
+        self.kval = 0
+        self.kmers = np.zeros(0, dtype=np.uint64)
+        self.counts = np.zeros(0, dtype=np.uint32)
+        self.edges = np.zeros(0, dtype=np.uint8)
+        self.first = np.zeros(0, dtype=np.int64)
+
+    # Method for the position after every read already in the graph
+    def nextPosition(self):
+        if len(self.first) == 0:
+            return 0
+        return int(self.first.max()) + 1
+
+    # Method for replacing the k-mer arrays by a merged table
+    def setTable(self, table):
+        self.kmers = table[0]
+        self.counts = table[1].astype(np.uint32)
+        self.edges = table[2]
+        self.first = table[3]
+
+    # Method for saving the graph to an index file
+    # Parameters: fname: the name of the index file
+    #             source: the name of the reads file the graph was
+    #                     built from, None if there is none
+    # Returns: N/A
+    # Note: the file is written under a temporary name and then
+    #       renamed, so an index file is never half written
+    def saveIndex(self, fname, source=None):
+        size, mtime, checksum = 0, 0, bytes(32)
+        if source is not None:
+            stat = os.stat(source)
+            size, mtime, checksum = stat.st_size, stat.st_mtime_ns, fileChecksum(source)
+        header = indexHeader.pack(indexMagic, self.kval, int(self.canonical),
+                                  len(self.kmers), size, mtime, checksum)
+        with open(fname + ".tmp", "wb") as f:
+            f.write(header)
+            for name, dtype in indexArrays:
+                np.asarray(getattr(self, name), dtype=dtype).tofile(f)
+        os.replace(fname + ".tmp", fname)
+
+    # Method for loading a graph from an index file
+    # Parameters: fname: the name of the index file
+    #             source: the name of the reads file the graph must
+    #                     have been built from, None to skip the check
+    #             kval: the k value the graph must have, None to skip
+    #                   the check
+    #             canonical: whether the graph must be canonical, None
+    #                        to skip the check
+    # Returns: the deBruijnGraph, or None if there is no index file or
+    #          it does not match
+    # Note: the arrays are memory-mapped copy-on-write, so loading
+    #       takes no time and changing the graph leaves the file as it
+    #       is. The reads file matches if its size and modification
+    #       time are the ones saved, or else if its checksum is.
+    @classmethod
+    def loadIndex(cls, fname, source=None, kval=None, canonical=None):
+        if not os.path.exists(fname):
+            return None
+        with open(fname, "rb") as f:
+            header = f.read(indexHeader.size)
+        if len(header) < indexHeader.size or header[:8] != indexMagic:
+            return None
+        magic, idxKval, flags, numKmers, size, mtime, checksum = indexHeader.unpack(header)
+        if kval is not None and kval != idxKval:
+            return None
+        if canonical is not None and canonical != bool(flags & 1):
+            return None
+        if source is not None:
+            stat = os.stat(source)
+            if stat.st_size != size:
+                return None
+            if stat.st_mtime_ns != mtime and fileChecksum(source) != checksum:
+                return None
+
+        graph = cls(bool(flags & 1))
+        graph.kval = idxKval
+        offset = indexHeader.size
+        for name, dtype in indexArrays:
+            dtype = np.dtype(dtype)
+            if numKmers > 0:
+                array = np.memmap(fname, dtype=dtype, mode="c", offset=offset,
+                                  shape=(numKmers,))
+            else:
+                array = np.zeros(0, dtype=dtype)
+            setattr(graph, name, array)
+            offset += numKmers * dtype.itemsize
+        return graph
+
+    # Method for building the graph
+    # Parameters: fstream: the input file stream that contains
+    #                      reads to be incorporated into the graph
+    #             kval: k value, the length of a k-mer in the graph
+    # Returns: N/A
+    # Note: it updates the graph that has been called upon. Every line
+    #       is one read.
+    def buildGraph(self, fstream, kval):
+        self.addReads(lineBatches(fstream, self.nextPosition()), kval)
+
+    # Method for adding batches of reads to the graph
+    # Parameters: batches: an iterable of (reads, position) pairs, as
+    #                      given by readStream.readBatches
+    #             kval: k value, the length of a k-mer in the graph
+    # Returns: N/A
+    def addReads(self, batches, kval):
+        if kval > maxKval:
+            raise ValueError("k value larger than " + str(maxKval))
+        self.kval = kval
+        table = (self.kmers, self.counts, self.edges, self.first)
+        self.setTable(countReads(batches, kval, table, self.canonical))
+
+    # Method for building the graph from a reads file across a pool of
+    # worker processes
+    # Parameters: fname: the name of the reads file
+    #             kval: k value, the length of a k-mer in the graph
+    #             numWorkers: the number of processes (all cores by
+    #                         default)
+    # Returns: N/A
+    # Note: for a plain file of one read per line, every worker counts
+    #       the k-mers of one byte range of the file into tables
+    #       partitioned by k-mer hash, and every partition is then
+    #       merged by one worker. FASTA, FASTQ and gzipped files are
+    #       read by this process and their batches counted by the
+    #       workers. The graph is the same as the one addReads builds
+    #       from readBatches(fname).
+    def buildGraphParallel(self, fname, kval, numWorkers=None):
+        if kval > maxKval:
+            raise ValueError("k value larger than " + str(maxKval))
+        if numWorkers is None:
+            numWorkers = os.cpu_count() or 1
+        self.kval = kval
+        offset = self.nextPosition()
+        table = (self.kmers, self.counts, self.edges, self.first)
+        with Pool(numWorkers) as pool:
+            if readsFormat(fname) != ("raw", False):
+                tables = pool.imap(partial(countBatch, kval=kval,
+                                           canonical=self.canonical),
+                                   readBatches(fname, offset))
+                self.setTable(mergeBatchTables(tables, table))
+                return
+            tasks = [(fname, start, end, kval, numWorkers, offset, self.canonical)
+                     for start, end in fileShards(fname, numWorkers)]
+            shardParts = pool.map(countShard, tasks)
+            parts = pool.map(mergeTables, [[shard[p] for shard in shardParts]
+                                           for p in range(numWorkers)])
+        self.setTable(mergeTables([table] + parts))
+
+    # Method for finding the nodes of packed k-mers
+    # Parameter: values: a uint64 array of packed k-mers
+    # Returns: an array of the indices of their nodes, -1 where the
+    #          k-mer is not in the graph
+    def findKmers(self, values):
+        if len(self.kmers) == 0:
+            return np.full(len(values), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.kmers, values), len(self.kmers) - 1)
+        return np.where(self.kmers[pos] == values, pos, -1)
+
+    # Method for finding the neighbors of nodes along one edge base
+    # Parameters: idx: an array of node indices
+    #             base: the base code of the edges
+    #             outgoing: True for the next k-mers (the base is
+    #                       appended), False for the previous ones (the
+    #                       base is prepended)
+    # Returns: (neighbors, flipped) arrays of the indices of the
+    #          neighbors, -1 where the neighbor is not in the graph,
+    #          and whether a neighbor node holds the reverse complement
+    #          of the neighbor k-mer (never in a non-canonical graph)
+    def neighborIdx(self, idx, base, outgoing=True):
+        kval = self.kval
+        values = self.kmers[idx]
+        if outgoing:
+            mask = np.uint64((1 << (2 * kval)) - 1)
+            values = ((values << np.uint64(2)) | np.uint64(base)) & mask
+        else:
+            values = np.uint64(base << (2 * kval - 2)) | (values >> np.uint64(2))
+        flipped = np.zeros(len(values), dtype=bool)
+        if self.canonical:
+            values, flipped = canonicalKmers(values, kval)
+        return self.findKmers(values), flipped
+
+    # Method for removing all branching nodes in the graph,
+    #        including their adjacent edges.
+    # Note: the edges of the neighbors are cleared with one lookup per
+    #       edge base for all branching nodes at once. In a canonical
+    #       graph, the edge of a neighbor holding the reverse complement
+    #       is its opposite edge, by the complementary base, and a
+    #       neighbor that is its own reverse complement loses both.
+    def removeBranchingNodes(self):
+        shift = np.uint64(2 * self.kval - 2)
+        branch = (edgeCounts[self.edges & 15] > 1) | (edgeCounts[self.edges >> 4] > 1)
+        bIdx = np.flatnonzero(branch)
+        bEdges = self.edges[bIdx]
+        firstBases = (self.kmers[bIdx] >> shift).astype(np.uint8)
+        lastBases = (self.kmers[bIdx] & np.uint64(3)).astype(np.uint8)
+        for base in range(4):
+            hasOut = (bEdges & (1 << base)) != 0
+            outIdx, flipped = self.neighborIdx(bIdx[hasOut], base, True)
+            self.clearEdges(outIdx, flipped, 16 << firstBases[hasOut],
+                            1 << (3 - firstBases[hasOut]))
+            hasIn = (bEdges & (16 << base)) != 0
+            inIdx, flipped = self.neighborIdx(bIdx[hasIn], base, False)
+            self.clearEdges(inIdx, flipped, 1 << lastBases[hasIn],
+                            16 << (3 - lastBases[hasIn]))
+        keep = ~branch
+        self.kmers = self.kmers[keep]
+        self.counts = self.counts[keep]
+        self.edges = self.edges[keep]
+        self.first = self.first[keep]
+
+    # Method for clearing one edge of nodes
+    # Parameters: idx: an array of node indices, -1 being skipped
+    #             flipped: whether the edge is seen from the reverse
+    #                      complement of the node
+    #             bits: the edge bit of every node seen as is
+    #             flippedBits: the edge bit of every node seen from its
+    #                          reverse complement
+    # Returns: N/A
+    def clearEdges(self, idx, flipped, bits, flippedBits):
+        found = idx >= 0
+        idx = idx[found]
+        bits = np.where(flipped[found], flippedBits[found], bits[found]).astype(np.uint8)
+        if self.canonical:
+            palin = reverseComplement(self.kmers[idx], self.kval) == self.kmers[idx]
+            bits |= np.where(palin, flippedBits[found], 0).astype(np.uint8)
+        np.bitwise_and.at(self.edges, idx, ~bits)
+
+    # Method for finding the single successor of every walk state
+    # Returns: an array with the next state of every state whose node
+    #          has exactly one outgoing edge in its orientation, and -1
+    #          for the others
+    # Note: a node read as its reverse complement goes on along its
+    #       ingoing edges, by their complementary bases
+    def successors(self):
+        succ = np.full(2 * len(self.kmers), -1, dtype=np.int64)
+        outMask = self.edges & 15
+        inMask = self.edges >> 4
+        for base in range(4):
+            idx = np.flatnonzero(outMask == (1 << base))
+            nextIdx, flipped = self.neighborIdx(idx, base, True)
+            succ[2 * idx] = np.where(nextIdx >= 0, 2 * nextIdx + flipped, -1)
+            if self.canonical:
+                idx = np.flatnonzero(inMask == (1 << base))
+                prevIdx, flipped = self.neighborIdx(idx, base, False)
+                succ[2 * idx + 1] = np.where(prevIdx >= 0, 2 * prevIdx + 1 - flipped, -1)
+        return succ
+
+    # Method for collapsing the non-branching paths of the graph into
+    # unitigs
+    # Returns: a unitigGraph of all unitigs
+    # Note: a state is linked to its successor when it has a single
+    #       outgoing edge and the successor a single ingoing edge, and
+    #       the unitigs are the chains of links. Chains are ranked by
+    #       pointer jumping, so no path is walked node by node. A cycle
+    #       is cut before its node that appears first, read forward.
+    #       In a canonical graph every unitig also exists as its
+    #       reverse complement, and only the one starting at the node
+    #       that appears first is kept (read backward if it is a single
+    #       node). A chain that turns into its own reverse complement,
+    #       at a link from a node to itself read backward or at a k-mer
+    #       that is its own reverse complement (which has one state),
+    #       is its own mirror image and only its first half is kept; a
+    #       cycle of two turns is cut before the first one. Unitigs are
+    #       ordered like the contigs of the former walk: paths by their
+    #       first node, then cycles. The walk could split a path between
+    #       two turns where it started inside it, and such a path is
+    #       kept whole, before the cycles.
+    def compactUnitigs(self):
+        numNodes = len(self.kmers)
+        numStates = 2 * numNodes
+        states = np.arange(numStates)
+        outCount = edgeCounts[self.edges & 15]
+        inCount = edgeCounts[self.edges >> 4]
+        inUse = np.ones(numStates, dtype=bool)
+        inDegree = np.zeros(numStates, dtype=np.uint8)
+        inDegree[0::2] = inCount
+        palin = np.zeros(numNodes, dtype=bool)
+        if self.canonical:
+            inDegree[1::2] = outCount
+            palin = reverseComplement(self.kmers, self.kval) == self.kmers
+            inUse[1::2] = ~palin
+        else:
+            inUse[1::2] = False
+
+        # links, the ones into the unused state of a palindrome going to
+        # its other state; the states where a chain turns into its own
+        # reverse complement are the palindromes and the ends of links
+        # between the two states of a node
+        succ = self.successors()
+        linked = np.flatnonzero(inUse & (succ >= 0))
+        nextStates = succ[linked]
+        keep = inDegree[nextStates] == 1
+        linked = linked[keep]
+        nextStates = np.where(palin[nextStates[keep] >> 1], nextStates[keep] & ~1,
+                              nextStates[keep])
+        succ = np.full(numStates, -1, dtype=np.int64)
+        succ[linked] = nextStates
+        pred = np.full(numStates, -1, dtype=np.int64)
+        pred[nextStates] = linked
+        turns = np.concatenate((2 * np.flatnonzero(palin),
+                                nextStates[(nextStates >> 1 == linked >> 1)
+                                           & (nextStates != linked)]))
+
+        # rank the chains, cutting every cycle before its turn or else
+        # its state of smallest (node order, orientation)
+        rank = np.empty(numNodes, dtype=np.int64)
+        rank[np.argsort(self.first, kind="stable")] = np.arange(numNodes)
+        keys = 2 * rank[states >> 1] + (states & 1)
+        heads = np.arange(numStates)
+        dist = np.zeros(numStates, dtype=np.int64)
+        used = states[inUse]
+        cutKeys = keys.copy()
+        cutKeys[turns] -= numStates
+        cuts = chainRanks(succ, pred, used, cutKeys, heads, dist)
+        sizes = np.bincount(heads[used], minlength=numStates)
+        folded = np.zeros(numStates, dtype=bool)
+        folded[heads[turns]] = True
+        halves = np.zeros(numStates, dtype=np.int64)
+        np.maximum.at(halves, heads[turns], dist[turns] + palin[turns >> 1])
+
+        # pick one unitig of every mirror pair, then order them
+        starts = np.flatnonzero(inUse & (pred < 0))
+        ends = np.full(numStates, -1, dtype=np.int64)
+        tails = np.flatnonzero(inUse & (succ < 0))
+        ends[heads[tails]] = tails
+        cycleCut = np.zeros(numStates, dtype=bool)
+        cycleCut[cuts] = True
+        if self.canonical:
+            mirror = np.where(cycleCut[starts], starts, ends[starts]) ^ 1
+            lone = (sizes[starts] == 1) & ~cycleCut[starts]
+            starts = starts[folded[starts] | ((keys[starts] ^ lone) <= (keys[mirror] ^ lone))]
+        starts = starts[np.lexsort((keys[starts], cycleCut[starts] & ~folded[starts],
+                                    cycleCut[starts]))]
+
+        # the first half of a folded chain ends at its last turn
+        sizes[folded] = halves[folded]
+        middle = used[folded[heads[used]] & (dist[used] == sizes[heads[used]] - 1)]
+        ends[heads[middle]] = middle
+        return self.unitigsFrom(starts, ends[starts], sizes[starts], heads, dist)
+
+    # Method for building the sequences of unitigs
+    # Parameters: starts: the first state of every unitig
+    #             ends: the last state of every unitig
+    #             sizes: the number of states of every unitig, the
+    #                    first ones of its chain
+    #             heads, dist: the first state of the chain of every
+    #                          state and its rank in it
+    # Returns: the unitigGraph of the unitigs, in the order of starts
+    # Note: all sequences are written into one array of base codes,
+    #       the k-mer of a first state followed by the last base of
+    #       every later state
+    def unitigsFrom(self, starts, ends, sizes, heads, dist):
+        kval = self.kval
+        numStates = 2 * len(self.kmers)
+        unitigOf = np.full(numStates, -1, dtype=np.int64)
+        unitigOf[starts] = np.arange(len(starts))
+        members = np.flatnonzero(unitigOf[heads] >= 0)
+        members = members[dist[members] < sizes[unitigOf[heads[members]]]]
+        owner = unitigOf[heads[members]]
+        lengths = sizes + kval - 1
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        shift = np.uint64(2 * kval - 2)
+        nodes = members >> 1
+        lastBases = np.where(members & 1, 3 - (self.kmers[nodes] >> shift),
+                             self.kmers[nodes] & np.uint64(3))
+        codes = np.zeros(offsets[-1], dtype=np.uint8)
+        codes[offsets[owner] + kval - 1 + dist[members]] = lastBases
+        values = self.kmers[starts >> 1]
+        if self.canonical:
+            values = np.where(starts & 1, reverseComplement(values, kval), values)
+        for i in range(kval - 1):
+            codes[offsets[:-1] + i] = (values >> np.uint64(2 * (kval - 1 - i))) & np.uint64(3)
+        letters = np.frombuffer(baseLetters.encode("ascii"), dtype=np.uint8)
+        return unitigGraph(kval, letters[codes].tobytes(), offsets, starts, ends)
+
+    # Method for finding all the contigs in the de Bruijn Graph
+    # Parameter: minLen: the minimum length of a contig that makes it 
+    #                    an acceptable contig to be reported
+    # Returns: an array of all contigs (strings)
+    # Note: the contigs are the unitigs of compactUnitigs, which can
+    #       be kept to pick contigs for several minimum lengths
+    def findContigs(self, minLen):
+        return self.compactUnitigs().contigs(minLen)
+
+    # Method for telling whether k-mers are solid, i.e. appear more
+    # than once in the graph
+    # Parameter: kmers: a uint64 array of packed k-mers
+    # Returns: a bool array
+    def isSolid(self, kmers):
+        if len(self.kmers) == 0:
+            return np.zeros(len(kmers), dtype=bool)
+        if self.canonical:
+            kmers = canonicalKmers(kmers, self.kval)[0]
+        idx = self.findKmers(kmers)
+        return (idx >= 0) & (self.counts[idx] > 1)
+
+    # Method for printing all good reads, which is defined as 
+    # containing all the k-mers that is not unique among all 
+    # other reads
+    # Parameter: batches: an iterable of (reads, position) pairs that
+    #                     contains all the original reads sequences,
+    #                     as given by readStream.readBatches
+    #            kval: the value of k, the length of a k-mer
+    # Returns: a (number of good reads, number of reads) pair
+    # Note: this function prints all the good reads, one per line, to
+    #       a file called "good_reads"
+    def printGoodReads(self, batches, kval):
+        return writeGoodReads(batches, kval, self.isSolid)
+
+
+
+# jumpRanks
+# Purpose: ranks every item of weighted chains by pointer jumping
+# Parameters: pred: an array of the previous item of every item, -1 for
+#                   the first item of a chain
+#             weights: the distance from its previous item to every item
+# Returns: (heads, dist) arrays of the first item of the chain of every
+#          item and the distance to it; items on a cycle get some item
+#          of the cycle, whose pred is not -1
+def jumpRanks(pred, weights):
+    linked = pred >= 0
+    heads = np.where(linked, pred, np.arange(len(pred)))
+    dist = np.where(linked, weights, 0)
+    active = np.flatnonzero(linked)
+    span = 1
+    while len(active) > 0 and span < len(pred):
+        hop = heads[active]
+        dist[active] += dist[hop]
+        heads[active] = heads[hop]
+        active = active[pred[heads[active]] >= 0]
+        span *= 2
+    return heads, dist
+
+
+# walkSegments
+# Purpose: walks from every ruler state to the next ruler, all walks
+#          advancing together one state per step
+# Parameters: succ: an array of the next state of every state, or -1
+#             isRuler: a bool array of the ruler states
+#             rulers: the rulers to walk from
+#             first: the index of rulers[0] among all rulers
+#             owner, local: arrays receiving the index of the ruler each
+#                           visited state is reached from and the
+#                           number of steps from it
+# Returns: (next, gap) arrays of the ruler (state) every walk ends at,
+#          -1 at the end of a chain, and its number of steps
+def walkSegments(succ, isRuler, rulers, first, owner, local):
+    nextRuler = np.full(len(rulers), -1, dtype=np.int64)
+    gap = np.zeros(len(rulers), dtype=np.int64)
+    idx = np.arange(len(rulers))
+    owner[rulers] = idx + first
+    local[rulers] = 0
+    curr = succ[rulers]
+    step = 1
+    while len(idx) > 0:
+        stop = curr < 0
+        stop[~stop] = isRuler[curr[~stop]]
+        nextRuler[idx[stop]] = curr[stop]
+        gap[idx[stop]] = step
+        idx = idx[~stop]
+        curr = curr[~stop]
+        owner[curr] = idx + first
+        local[curr] = step
+        curr = succ[curr]
+        step += 1
+    return nextRuler, gap
+
+
+# Spacing of the ruler states of chainRanks
+rulerStride = 32
+
+
+# chainRanks
+# Purpose: ranks the states of chains of states, cutting every cycle
+#          before its state of smallest key
+# Parameters: succ, pred: arrays of the next and previous state of
+#                         every state, -1 at the ends of a chain; the
+#                         links into cut states are removed
+#             states: the states to rank, closed under succ and pred
+#             keys: distinct keys of all states
+#             heads, dist: arrays receiving the first state of the
+#                          chain of every state and its rank in it
+# Returns: the array of the states where cycles were cut
+# Note: the chain starts and every state that is a multiple of
+#       rulerStride are rulers. Walks between rulers rank the states
+#       of every segment, and pointer jumping ranks the few rulers.
+#       Cycles are found among the rulers and ranked again once cut.
+def chainRanks(succ, pred, states, keys, heads, dist):
+    numStates = len(succ)
+    isRuler = np.zeros(numStates, dtype=bool)
+    isRuler[states[(pred[states] < 0) | (states % rulerStride == 0)]] = True
+    owner = np.full(numStates, -1, dtype=np.int64)
+    local = np.zeros(numStates, dtype=np.int64)
+    rulers = states[isRuler[states]]
+    nextRuler, gap = walkSegments(succ, isRuler, rulers, 0, owner, local)
+
+    # cycles without any ruler get a ruler at every state
+    missed = states[owner[states] < 0]
+    if len(missed) > 0:
+        isRuler[missed] = True
+        moreNext, moreGap = walkSegments(succ, isRuler, missed, len(rulers), owner, local)
+        rulers = np.concatenate((rulers, missed))
+        nextRuler = np.concatenate((nextRuler, moreNext))
+        gap = np.concatenate((gap, moreGap))
+
+    rulerIdx = np.full(numStates, -1, dtype=np.int64)
+    rulerIdx[rulers] = np.arange(len(rulers))
+    ended = nextRuler < 0
+    rulerNext = np.where(ended, -1, rulerIdx[nextRuler])
+    rulerPred = np.full(len(rulers), -1, dtype=np.int64)
+    weights = np.zeros(len(rulers), dtype=np.int64)
+    rulerPred[rulerNext[~ended]] = np.flatnonzero(~ended)
+    weights[rulerNext[~ended]] = gap[~ended]
+    rulerHeads, rulerDist = jumpRanks(rulerPred, weights)
+
+    cuts = np.zeros(0, dtype=np.int64)
+    cycleRulers = np.flatnonzero(rulerPred[rulerHeads] >= 0)
+    onCycle = np.zeros(len(rulers), dtype=bool)
+    onCycle[cycleRulers] = True
+    if len(cycleRulers) > 0:
+        # smallest key of every cycle, by segment and then by pointer
+        # jumping among its rulers
+        cycleStates = states[onCycle[owner[states]]]
+        low = np.full(len(rulers), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(low, owner[cycleStates], keys[cycleStates])
+        hop = rulerNext.copy()
+        span = 1
+        while span < len(cycleRulers):
+            low[cycleRulers] = np.minimum(low[cycleRulers], low[hop[cycleRulers]])
+            hop[cycleRulers] = hop[hop[cycleRulers]]
+            span *= 2
+        cuts = cycleStates[keys[cycleStates] == low[owner[cycleStates]]]
+        succ[pred[cuts]] = -1
+        pred[cuts] = -1
+        chainRanks(succ, pred, cycleStates, keys, heads, dist)
+
+    pathStates = states[~onCycle[owner[states]]]
+    heads[pathStates] = rulers[rulerHeads[owner[pathStates]]]
+    dist[pathStates] = rulerDist[owner[pathStates]] + local[pathStates]
+    return cuts
+
+
+# Class definition for the compacted de Bruijn graph, whose nodes are
+# the unitigs (maximal non-branching paths) of a deBruijnGraph
+# Note: the sequences of all unitigs are kept in one bytes buffer
+class unitigGraph:
+    # Parameters: kval: the k value of the de Bruijn graph
+    #             sequence: the concatenated unitig sequences
+    #             offsets: the start of every unitig in sequence,
+    #                      followed by the length of sequence
+    #             starts, ends: the walk states of the de Bruijn graph
+    #                           that every unitig starts and ends with
+    def __init__(self, kval, sequence, offsets, starts, ends):
+        self.kval = kval
+        self.sequence = sequence
+        self.offsets = offsets
+        self.starts = starts
+        self.ends = ends
+        self.lengths = np.diff(offsets)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    # Method for the sequence of one unitig
+    # Parameter: idx: the index of the unitig
+    # Returns: the sequence string
+    def unitig(self, idx):
+        return self.sequence[self.offsets[idx]:self.offsets[idx + 1]].decode("ascii")
+
+    # Method for the contigs of at least a minimum length
+    # Parameter: minLen: the minimum length of a contig
+    # Returns: a list of the sequences of the long enough unitigs
+    def contigs(self, minLen):
+        return [self.unitig(idx) for idx in np.flatnonzero(self.lengths >= minLen)]
+
+
+# outputContigs
+# Purpose: printing out contigs and lengths of contigs to 
+#          "output_contigs" and "contig_lengths" respectively
+# Parameters: contigs: an array of the contigs to be printed
+#             suffix: appended to both file names, e.g. "_k31"
+def outputContigs(contigs, suffix=""):
+
+    original_stdout = sys.stdout 
+
+    with open('output_contigs' + suffix, 'w') as f:
+        sys.stdout = f 
+        for contig in contigs:
+            print(contig)
+
+    with open('contig_lengths' + suffix, 'w') as f:
+        sys.stdout = f 
+        for contig in contigs:
+            print(len(contig))       
+
+    sys.stdout = original_stdout # restore the original stdout
+
+
+# Main function starts here
+if __name__ == "__main__":
+
+    # count a k-mer and its reverse complement as one canonical k-mer
+    canonical = "--canonical" in sys.argv
+    if canonical:
+        sys.argv.remove("--canonical")
+
+    # keep the graph of the reads in an index file between runs
+    indexName = None
+    if "--index" in sys.argv[:-1]:
+        pos = sys.argv.index("--index")
+        indexName = sys.argv[pos + 1]
+        del sys.argv[pos:pos + 2]
+
+    # print the statistics of the contigs as JSON, with NG50 and LG50
+    # for a given genome size
+    printJson = "--json" in sys.argv
+    if printJson:
+        sys.argv.remove("--json")
+    genomeSize = None
+    if "--genome" in sys.argv[:-1]:
+        pos = sys.argv.index("--genome")
+        genomeSize = int(sys.argv[pos + 1])
+        del sys.argv[pos:pos + 2]
+
+    # size the filter of mode "s" for a given number of distinct k-mers
+    # instead of growing it while it is filled, and bound its number of
+    # bytes
+    numKmers = None
+    if "--kmers" in sys.argv[:-1]:
+        pos = sys.argv.index("--kmers")
+        numKmers = int(sys.argv[pos + 1])
+        del sys.argv[pos:pos + 2]
+    maxBytes = None
+    if "--memory" in sys.argv[:-1]:
+        pos = sys.argv.index("--memory")
+        maxBytes = int(sys.argv[pos + 1])
+        del sys.argv[pos:pos + 2]
+
+    if len(sys.argv) < 4:
+        print("Too few arguments.")
+        exit()
+    elif sys.argv[2] not in ("g", "c", "s", "k"):
+        print("Mode not supported.")
+        exit()
+    elif len(sys.argv) > (5 if sys.argv[2] == "g" else 6):
+        print("Too many arguments.")
+        exit()
+
+    # set the length of a k-mer, or the comma-separated lengths of a
+    # sweep
+    kvals = sorted(set(int(k) for k in sys.argv[3].split(",")))
+    kval = kvals[-1]
+    if len(kvals) > 1 and sys.argv[2] != "k":
+        print("Several k values are only supported in mode 'k'.")
+        exit()
+    if kval > maxKval:
+        print("k value larger than", maxKval, "is not supported.")
+        exit()
+
+    # set the number of processes counting the k-mers
+    numWorkers = 1
+    if sys.argv[2] == "g" and len(sys.argv) == 5:
+        numWorkers = int(sys.argv[4])
+    elif sys.argv[2] in ("c", "k") and len(sys.argv) == 6:
+        numWorkers = int(sys.argv[5])
+
+    fname = sys.argv[1]
+    myGraph = deBruijnGraph(canonical)
+    if sys.argv[2] == "s":
+        # set the target false-positive rate of the filter
+        errorRate = 0.01
+        if len(sys.argv) >= 5:
+            errorRate = float(sys.argv[4])
+        sketch, numGood, numReads = filterSolidReads(fname, kval, errorRate, numKmers,
+                                                    maxBytes, canonical)
+        print("good reads:", numGood, "of", numReads)
+        print("filter size:", sketch.numBytes(), "bytes,", len(sketch.filters), "filters,",
+              "hashes:", ",".join(str(f.numHashes) for f in sketch.filters))
+        print("estimated k-mer false-positive rate:", sketch.errorRate())
+        if len(sys.argv) == 6 and sys.argv[5] == "exact":
+            myGraph.addReads(readBatches(fname), kval)
+            rate, exactGood = sketchFalsePositives(myGraph, sketch, readBatches(fname), kval)
+            print("measured k-mer false-positive rate:", rate)
+            print("good reads of the exact check:", exactGood,
+                  "(" + str(numGood - exactGood), "false positives)")
+        exit()
+
+    if sys.argv[2] == "k":
+        # set the minimum contig length to filter out short contigs
+        mincLength = 100
+        if len(sys.argv) >= 5:
+            mincLength = int(sys.argv[4])
+        graphs = sweepGraphs(readBatches(fname), kvals, canonical, numWorkers)
+        sweepStats = {}
+        for kval, graph in graphs.items():
+            graph.removeBranchingNodes()
+            unitigs = graph.compactUnitigs()
+            outputContigs(unitigs.contigs(mincLength), "_k" + str(kval))
+            sweepStats[kval] = contigStats(unitigs.lengths[unitigs.lengths >= mincLength],
+                                           genomeSize)
+            sweepStats[kval]["numKmers"] = len(graph.kmers)
+        if printJson:
+            print(json.dumps({str(kval): stats for kval, stats in sweepStats.items()}))
+            exit()
+        print("%4s %10s %8s %10s %8s %8s %6s" % ("k", "k-mers", "contigs", "total", "max",
+                                                 "N50", "L50"))
+        for kval, stats in sweepStats.items():
+            print("%4d %10d %8d %10d %8d %8d %6d" % (kval, stats["numKmers"], stats["numContigs"],
+                                                     stats["totalLength"], stats["maxLength"],
+                                                     stats["n50"], stats["l50"]))
+        exit()
+
+    indexGraph = None
+    keeper = None
+    if indexName is not None:
+        indexGraph = deBruijnGraph.loadIndex(indexName, fname, kval, canonical)
+    if indexGraph is not None:
+        myGraph = indexGraph
+    elif numWorkers > 1:
+        myGraph.buildGraphParallel(fname, kval, numWorkers)
+    else:
+        batches = readBatches(fname)
+        if sys.argv[2] == "g":
+            # keep the reads of the graph pass for the filter, as long
+            # as they fit in keptReadsBytes
+            keeper = batchKeeper(batches, keptReadsBytes)
+            batches = keeper
+        myGraph.addReads(batches, kval)
+    if indexName is not None and indexGraph is None:
+        myGraph.saveIndex(indexName, fname)
+
+
+    if sys.argv[2] == "g":
+        # the file is only read again when the graph was built without
+        # going through the reads here, or they did not fit in memory
+        batches = readBatches(fname)
+        if keeper is not None and keeper.kept is not None:
+            batches = keeper.kept
+        myGraph.printGoodReads(batches, kval)
+    else: # sys.argv[2] == "c"
+        # set the minimum contig length to filter out short contigs
+        mincLength = 100
+        if len(sys.argv) >= 5:
+            mincLength = int(sys.argv[4])
+        myGraph.removeBranchingNodes()
+        unitigs = myGraph.compactUnitigs()
+        outputContigs(unitigs.contigs(mincLength))
+        if printJson:
+            print(json.dumps(contigStats(unitigs.lengths[unitigs.lengths >= mincLength],
+                                         genomeSize)))
\ No newline at end of file
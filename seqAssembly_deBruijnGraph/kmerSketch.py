@@ -0,0 +1,261 @@
+"""
+kmerSketch.py
+
+Description: A counting Bloom filter of 2-bit packed k-mers, used to
+    tell solid k-mers (seen more than once) from unique ones in a fixed
+    amount of memory. Every k-mer sets numHashes counters of 2 bits
+    that saturate at 2, so a k-mer seen twice always reads as solid and
+    a unique k-mer only does when all its counters were also hit by
+    other k-mers (a false positive). When the number of distinct k-mers
+    is not known beforehand, a scalable filter adds larger filters as
+    they fill up, a HyperLogLog sketch telling when a filter is full.
+"""
+
+import math
+import numpy as np
+
+
+# Largest value of a counter, meaning "seen more than once"
+solidCount = 2
+
+# Number of distinct k-mers of the first filter of a scalableBloomFilter,
+# how many times more each new filter is sized for, and how much lower
+# the error rate of each new filter is
+initialKmers = 1 << 16
+growthFactor = 4
+tightening = 0.8
+
+
+# mixHash
+# Purpose: scrambles 64-bit integers (the splitmix64 finalizer)
+# Parameter: values: a uint64 array
+# Returns: a uint64 array of hashes
+def mixHash(values):
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+# Class definition for a counting Bloom filter of k-mers
+# Note: counters are packed four to a byte
+class countingBloomFilter:
+    # Parameters: numCounters: the number of 2-bit counters
+    #             numHashes: the number of counters set by a k-mer
+    def __init__(self, numCounters, numHashes):
+        self.numCounters = max(int(numCounters), 1)
+        self.numHashes = max(int(numHashes), 1)
+        self.cells = np.zeros((self.numCounters + 3) // 4, dtype=np.uint8)
+
+    # Method for creating a filter with a target false-positive rate
+    # Parameters: numKmers: an upper bound on the number of distinct
+    #                       k-mers to be added, or an estimate of it
+    #             errorRate: the probability that a unique k-mer reads
+    #                        as solid once all k-mers are added
+    #             maxBytes: the most bytes of counters, no bound if None
+    # Returns: a new countingBloomFilter
+    # Note: it uses the sizes of an optimal Bloom filter, m = -n ln(p)
+    #       / ln(2)^2 counters and -log2(p) hashes. When the counters
+    #       do not fit in maxBytes, the filter takes maxBytes and the
+    #       m / n ln(2) hashes that are optimal for that size, and the
+    #       error rate is then higher than asked for.
+    @classmethod
+    def forErrorRate(cls, numKmers, errorRate, maxBytes=None):
+        if not 0 < errorRate < 1:
+            raise ValueError("error rate must be between 0 and 1")
+        numKmers = max(numKmers, 1)
+        numCounters = math.ceil(-numKmers * math.log(errorRate) / math.log(2) ** 2)
+        if maxBytes is not None and numCounters > 4 * maxBytes:
+            numCounters = 4 * maxBytes
+            return cls(numCounters, round(numCounters / numKmers * math.log(2)))
+        return cls(numCounters, round(-math.log2(errorRate)))
+
+    # Method for the counters of k-mers
+    # Parameter: kmers: a uint64 array of packed k-mers
+    # Returns: a numHashes x len(kmers) array of counter indices
+    # Note: counters are picked by double hashing
+    def positions(self, kmers):
+        first = mixHash(kmers)
+        step = mixHash(first) | np.uint64(1)
+        rounds = np.arange(self.numHashes, dtype=np.uint64)[:, None]
+        return (first + rounds * step) % np.uint64(self.numCounters)
+
+    # Method for adding k-mers to the filter
+    # Parameter: kmers: a uint64 array of packed k-mers, in which a
+    #                   k-mer may appear several times
+    # Returns: N/A
+    # Note: when double hashing gives a k-mer the same counter twice,
+    #       the counter is only raised once for it, so every occurrence
+    #       of a k-mer adds at most 1 to each counter
+    def add(self, kmers):
+        idx = self.positions(kmers)
+        if self.numHashes > 1:
+            # the counters of a k-mer go round a cycle, so a counter is
+            # a repeat exactly when one after the first is back to the
+            # first counter
+            repeat = np.logical_or.accumulate(idx[1:] == idx[0], axis=0)
+            idx = np.concatenate((idx[0], idx[1:][~repeat]))
+        idx, hits = np.unique(idx, return_counts=True)
+        cellIdx = idx >> np.uint64(2)
+        shift = ((idx & np.uint64(3)) * np.uint64(2)).astype(np.uint8)
+        old = (self.cells[cellIdx] >> shift) & 3
+        new = np.minimum(old + hits, solidCount).astype(np.uint8)
+        # counters only grow, so xor-ing in the changed bits updates
+        # each counter without touching the others of its byte
+        np.bitwise_xor.at(self.cells, cellIdx, (old ^ new) << shift)
+
+    # Method for the counts of k-mers, which are at least their true
+    # counts (up to solidCount)
+    # Parameter: kmers: a uint64 array of packed k-mers
+    # Returns: a uint8 array of counts between 0 and solidCount
+    def counts(self, kmers):
+        idx = self.positions(kmers)
+        shift = ((idx & np.uint64(3)) * np.uint64(2)).astype(np.uint8)
+        values = (self.cells[idx >> np.uint64(2)] >> shift) & 3
+        return values.min(axis=0)
+
+    # Method for telling whether k-mers are solid
+    # Parameter: kmers: a uint64 array of packed k-mers
+    # Returns: a bool array
+    def isSolid(self, kmers):
+        return self.counts(kmers) >= solidCount
+
+    # Method for estimating the false-positive rate of the filter
+    # Returns: the probability that a unique k-mer reads as solid
+    # Note: a counter of a unique k-mer reads as solid when another
+    #       k-mer hit it too, which is about as likely as any counter
+    #       being in use
+    def errorRate(self):
+        used = sum(np.count_nonzero((self.cells >> shift) & 3) for shift in (0, 2, 4, 6))
+        return (used / self.numCounters) ** self.numHashes
+
+
+# Class definition for a scalable counting Bloom filter, a list of
+# counting Bloom filters for a growing number of distinct k-mers
+# Note: k-mers are added to the last filter, and a new filter for
+#       growthFactor times as many k-mers is added once the last one
+#       holds as many distinct k-mers as it is sized for. The count of
+#       a k-mer is the sum of its counts in all filters. Filter i is
+#       sized for an error rate of errorRate * (1 - tightening) *
+#       tightening^i, so that all filters together keep a unique k-mer
+#       from reading as solid with about errorRate.
+class scalableBloomFilter:
+    # Parameters: errorRate: the probability that a unique k-mer reads
+    #                        as solid once all k-mers are added
+    #             numKmers: the number of distinct k-mers of the first
+    #                       filter, None for initialKmers; when given,
+    #                       it is the only filter
+    #             maxBytes: the most bytes of counters of all filters,
+    #                       no bound if None
+    def __init__(self, errorRate, numKmers=None, maxBytes=None):
+        self.targetRate = errorRate
+        self.maxBytes = maxBytes
+        self.growing = numKmers is None
+        self.filters = []
+        self.capacity = 0
+        self.distinct = None
+        self.grow(initialKmers if numKmers is None else numKmers)
+
+    # Method for adding a filter
+    # Parameter: numKmers: the number of distinct k-mers it is sized for
+    # Returns: N/A
+    def grow(self, numKmers):
+        rate = self.targetRate
+        if self.growing:
+            rate *= (1 - tightening) * tightening ** len(self.filters)
+        maxBytes = None
+        if self.maxBytes is not None:
+            maxBytes = self.maxBytes - self.numBytes()
+            if len(self.filters) > 0 and maxBytes < self.filters[-1].cells.nbytes:
+                # no room for a larger filter: the last filter takes all
+                # other k-mers
+                self.growing = False
+                return
+        self.filters.append(countingBloomFilter.forErrorRate(numKmers, rate, maxBytes))
+        self.capacity = numKmers
+        self.distinct = hyperLogLog()
+
+    # Method for the number of bytes of counters of all filters
+    # Returns: the number of bytes
+    def numBytes(self):
+        return sum(f.cells.nbytes for f in self.filters)
+
+    # Method for adding k-mers to the filter
+    # Parameter: kmers: a uint64 array of packed k-mers, in which a
+    #                   k-mer may appear several times
+    # Returns: N/A
+    # Note: k-mers are added a sixteenth of the size of the last filter
+    #       at a time, and a new filter is added first when they could
+    #       take the last one past its size
+    def add(self, kmers):
+        start = 0
+        while start < len(kmers):
+            if not self.growing:
+                self.filters[-1].add(kmers[start:])
+                return
+            stop = start + max(self.capacity // 16, 1)
+            if self.distinct.estimate() + len(kmers[start:stop]) > self.capacity:
+                self.grow(self.capacity * growthFactor)
+                continue
+            self.filters[-1].add(kmers[start:stop])
+            self.distinct.add(kmers[start:stop])
+            start = stop
+
+    # Method for the counts of k-mers, which are at least their true
+    # counts (up to solidCount)
+    # Parameter: kmers: a uint64 array of packed k-mers
+    # Returns: a uint8 array of counts between 0 and solidCount
+    def counts(self, kmers):
+        counts = sum(f.counts(kmers).astype(np.int64) for f in self.filters)
+        return np.minimum(counts, solidCount).astype(np.uint8)
+
+    # Method for telling whether k-mers are solid
+    # Parameter: kmers: a uint64 array of packed k-mers
+    # Returns: a bool array
+    def isSolid(self, kmers):
+        return self.counts(kmers) >= solidCount
+
+    # Method for estimating the false-positive rate of the filter
+    # Returns: the probability that a unique k-mer reads as solid
+    # Note: a unique k-mer reads as solid when one filter other than
+    #       its own also counts it, or its own counts it twice, which is
+    #       about the sum of the false-positive rates of the filters
+    def errorRate(self):
+        return min(sum(f.errorRate() for f in self.filters), 1.0)
+
+
+# Class definition for a HyperLogLog sketch, estimating the number of
+# distinct k-mers in a fixed amount of memory
+# Note: the estimate is off by about 1.04 / sqrt(2^precision), 0.8%
+#       with the default precision, in 2^precision bytes
+class hyperLogLog:
+    # Parameter: precision: the number of hash bits picking a register
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    # Method for adding k-mers to the sketch
+    # Parameter: kmers: a uint64 array of packed k-mers, in which a
+    #                   k-mer may appear several times
+    # Returns: N/A
+    def add(self, kmers):
+        hashes = mixHash(kmers)
+        rest = 64 - self.precision
+        idx = (hashes >> np.uint64(rest)).astype(np.int64)
+        # the rank is the position of the first set bit of the other
+        # bits, which frexp gives exactly as they fit in a float64
+        low = (hashes & np.uint64((1 << rest) - 1)).astype(np.float64)
+        rank = (rest + 1 - np.frexp(low)[1]).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    # Method for estimating the number of distinct k-mers added
+    # Returns: the estimate, a float
+    # Note: small counts, which leave registers at 0, are estimated by
+    #       linear counting instead
+    def estimate(self):
+        numRegisters = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / numRegisters)
+        estimate = alpha * numRegisters ** 2 / np.exp2(-self.registers.astype(np.float64)).sum()
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * numRegisters and zeros > 0:
+            estimate = numRegisters * math.log(numRegisters / zeros)
+        return float(estimate)
@@ -1,33 +1,49 @@
-import numpy as np
-
-fstream = open("contig_lengths", "r")
-
-contigLen = []
-
-for line in fstream:
-    contigLen.append(int(line))
-
-contigLen.sort(reverse=True)
-
-# print(contigLen)
-
-
-s2 = 0
-
-n50 = np.sum(contigLen)/2
-
-for i in range(len(contigLen)):
-    s2 += contigLen[i]
-    if s2 >= n50:
-        print("the ", i, "exceeds", n50, "total sum:", n50 * 2)
-        print("sum of contig lengths up to this:",s2,",N-50 size:", contigLen[i])
-        break
-
-print("Max contig Length:", contigLen[0])
-
-# numShort = 0
-
-# for elem in contigLen:
-#     if elem < 100:
-#         numShort += 1
-# print(numShort/len(contigLen))
\ No newline at end of file
+"""
+processor.py
+
+Description: Prints the statistics of the contigs of a contig_lengths
+    file written by deBruijnGraph.py. The assembler can also print them
+    itself with --json, without going through the file.
+
+Usage: python3 processor.py (contig lengths filename) (genome size)
+"""
+
+import sys
+import numpy as np
+from assemblyStats import lengthHistogram
+
+
+# Number of lengths read at a time
+chunkLines = 1 << 20
+
+
+# fileStats
+# Purpose: computes the statistics of a file of contig lengths, one
+#          per line, reading it in chunks
+# Parameters: fname: the file name
+#             genomeSize: the length of the genome, None if unknown
+# Returns: the dict of assemblyStats.lengthHistogram.stats
+def fileStats(fname, genomeSize=None):
+    histogram = lengthHistogram()
+    with open(fname, "r") as fstream:
+        lines = []
+        for line in fstream:
+            if line.strip():
+                lines.append(line)
+            if len(lines) == chunkLines:
+                histogram.add(np.array(lines, dtype=np.int64))
+                lines = []
+        histogram.add(np.array(lines, dtype=np.int64))
+    return histogram.stats(genomeSize)
+
+
+if __name__ == "__main__":
+    fname = sys.argv[1] if len(sys.argv) > 1 else "contig_lengths"
+    genomeSize = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    stats = fileStats(fname, genomeSize)
+
+    print("number of contigs:", stats["numContigs"], ", total length:", stats["totalLength"])
+    print("N-50 size:", stats["n50"], ", L-50:", stats["l50"])
+    if genomeSize is not None:
+        print("NG-50 size:", stats["ng50"], ", LG-50:", stats["lg50"])
+    print("Max contig Length:", stats["maxLength"])
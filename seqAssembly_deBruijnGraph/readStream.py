@@ -0,0 +1,238 @@
+"""
+readStream.py
+
+Description: Single-pass reading of sequencing reads for the de Bruijn
+    graph assembler. Plain files are memory-mapped and gzip files are
+    decompressed as a stream. Reads may be given one per line, in FASTA
+    or in FASTQ, and are handed out in batches of clean byte strings:
+    no line ends, headers or qualities.
+"""
+
+import gzip
+import hashlib
+import mmap
+import os
+
+
+# Number of file bytes handled in one batch
+batchSize = 1 << 20
+
+# First bytes of a gzip file
+gzipMagic = b"\x1f\x8b"
+
+
+# chunkLines
+# Purpose: splits a chunk of a file into its lines
+# Parameter: chunk: bytes ending at a line end, or at the end of file
+# Returns: the list of lines, without their line ends
+def chunkLines(chunk):
+    if b"\r" in chunk:
+        chunk = chunk.replace(b"\r\n", b"\n")
+    lines = chunk.split(b"\n")
+    if chunk.endswith(b"\n"):
+        lines.pop()
+    return lines
+
+
+# bufferChunks
+# Purpose: cuts a byte range of a buffer (e.g. a memory-mapped file)
+#          into chunks of about batchSize bytes ending at line ends
+# Parameters: buf: the buffer
+#             start, end: the byte range, starting at a line start
+#                         (the whole buffer by default)
+#             offset: added to the positions of the chunks
+# Returns: a generator yielding (chunk, position of the chunk) pairs
+def bufferChunks(buf, start=0, end=None, offset=0):
+    if end is None:
+        end = len(buf)
+    pos = start
+    while pos < end:
+        stop = min(pos + batchSize, end)
+        if stop < end:
+            lineEnd = buf.find(b"\n", stop - 1, end)
+            stop = end if lineEnd < 0 else lineEnd + 1
+        yield buf[pos:stop], pos + offset
+        pos = stop
+
+
+# streamChunks
+# Purpose: cuts a binary stream (e.g. a gzip file) into chunks of about
+#          batchSize bytes ending at line ends
+# Parameters: stream: the binary stream
+#             offset: the position of the first byte of the stream
+# Returns: a generator yielding (chunk, position of the chunk) pairs
+def streamChunks(stream, offset=0):
+    carry = b""
+    while True:
+        data = stream.read(batchSize)
+        if len(data) == 0:
+            break
+        data = carry + data
+        lineEnd = data.rfind(b"\n")
+        if lineEnd < 0:
+            carry = data
+            continue
+        yield data[:lineEnd + 1], offset
+        offset += lineEnd + 1
+        carry = data[lineEnd + 1:]
+    if len(carry) > 0:
+        yield carry, offset
+
+
+# rawBatches
+# Purpose: reads batches of reads given one per line
+# Parameter: chunks: an iterable of (chunk, position) pairs
+# Returns: a generator yielding (reads, position of the first read)
+#          pairs
+def rawBatches(chunks):
+    for chunk, offset in chunks:
+        yield chunkLines(chunk), offset
+
+
+# fastaBatches
+# Purpose: reads batches of FASTA records, whose sequences may be split
+#          over several lines
+# Parameter: chunks: an iterable of (chunk, position) pairs
+# Returns: a generator yielding (reads, position of the first read)
+#          pairs, the position of a read being the one of its header
+# Note: a record is in the batch of the chunk where it ends, and
+#       lines before the first header are ignored
+def fastaBatches(chunks):
+    parts = []
+    recOffset = -1
+    for chunk, offset in chunks:
+        reads = []
+        batchOffset = -1
+        pos = offset
+        for line in chunkLines(chunk):
+            if line[:1] == b">":
+                if recOffset >= 0:
+                    if batchOffset < 0:
+                        batchOffset = recOffset
+                    reads.append(b"".join(parts))
+                parts = []
+                recOffset = pos
+            elif recOffset >= 0:
+                parts.append(line)
+            pos += len(line) + 1
+        if len(reads) > 0:
+            yield reads, batchOffset
+    if recOffset >= 0:
+        yield [b"".join(parts)], recOffset
+
+
+# fastqBatches
+# Purpose: reads batches of FASTQ records (header, sequence, "+" line
+#          and qualities, one line each)
+# Parameter: chunks: an iterable of (chunk, position) pairs
+# Returns: a generator yielding (reads, position of the chunk) pairs
+# Note: records are told apart by counting lines, blank ones included,
+#       as an empty read has a blank sequence and quality line; only
+#       the blank lines ending the file are skipped, so the blank lines
+#       ending a chunk are held back until a later line follows them
+def fastqBatches(chunks):
+    phase = 0
+    blanks = []
+    for chunk, offset in chunks:
+        lines = chunkLines(chunk)
+        if len(blanks) > 0:
+            lines = blanks + lines
+        end = len(lines)
+        while end > 0 and len(lines[end - 1]) == 0:
+            end -= 1
+        blanks = lines[end:]
+        if end < len(lines):
+            lines = lines[:end]
+        reads = lines[(1 - phase) % 4::4]
+        phase = (phase + len(lines)) % 4
+        if len(reads) > 0:
+            yield reads, offset
+
+
+# Batch readers by format
+formatBatches = {"raw": rawBatches, "fasta": fastaBatches, "fastq": fastqBatches}
+
+
+# sniffFormat
+# Purpose: tells the format of reads from the start of a file
+# Parameter: head: the first bytes of the (decompressed) file
+# Returns: "fasta", "fastq" or "raw" (one read per line)
+def sniffFormat(head):
+    first = head.lstrip()[:1]
+    if first == b">":
+        return "fasta"
+    if first == b"@":
+        return "fastq"
+    return "raw"
+
+
+# readsFormat
+# Purpose: tells the format of a reads file and whether it is gzipped
+# Parameter: fname: the file name
+# Returns: a (format, compressed) pair, format as given by sniffFormat
+def readsFormat(fname):
+    with open(fname, "rb") as f:
+        head = f.read(4096)
+        if head[:2] == gzipMagic:
+            f.seek(0)
+            with gzip.GzipFile(fileobj=f) as stream:
+                return sniffFormat(stream.read(4096)), True
+    return sniffFormat(head), False
+
+
+# fileChecksum
+# Purpose: computes a checksum of the bytes of a file
+# Parameter: fname: the file name
+# Returns: the 32-byte BLAKE2b digest of the file
+def fileChecksum(fname):
+    digest = hashlib.blake2b(digest_size=32)
+    with open(fname, "rb") as f:
+        while True:
+            data = f.read(batchSize)
+            if len(data) == 0:
+                break
+            digest.update(data)
+    return digest.digest()
+
+
+# readBatches
+# Purpose: reads all reads of a file in one pass
+# Parameters: fname: the name of a plain or gzipped file of reads, one
+#                    per line, in FASTA or in FASTQ
+#             offset: added to the positions of the reads
+# Returns: a generator yielding (reads, position of the first read)
+#          pairs, reads being a list of byte strings
+# Note: positions increase along the file and a batch never spans
+#       more positions than the length of its joined reads, so they
+#       order the reads like the file does
+def readBatches(fname, offset=0):
+    fmt, compressed = readsFormat(fname)
+    if compressed:
+        with gzip.open(fname, "rb") as stream:
+            yield from formatBatches[fmt](streamChunks(stream, offset))
+    elif os.path.getsize(fname) > 0:
+        with open(fname, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield from formatBatches[fmt](bufferChunks(buf, offset=offset))
+            finally:
+                buf.close()
+
+
+# shardBatches
+# Purpose: reads the reads of a byte range of a plain file of reads
+#          given one per line
+# Parameters: fname: the file name
+#             start, end: the byte range, starting at a line start
+#             offset: added to the positions of the reads
+# Returns: a generator yielding (reads, byte position of the first
+#          read) pairs, like readBatches
+def shardBatches(fname, start, end, offset=0):
+    if start >= end:
+        return
+    with open(fname, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield from rawBatches(bufferChunks(buf, start, end, offset))
+        finally:
+            buf.close()
@@ -0,0 +1,27 @@
+"""
+test_readStream.py
+
+Description: Checks that FASTQ records keep their four lines together
+    around an empty read, whatever the chunk boundaries.
+
+Usage: python3 -m pytest test_readStream.py
+"""
+
+import io
+import readStream
+
+
+# A record with an empty sequence and an empty quality line, and blank
+# lines ending the file
+emptyRead = (b"@r1\nACGTACGT\n+\nIIIIIIII\n@r2\n\n+\n\n"
+             b"@r3\nGGGTTT\n+\nIIIIII\n\n\n")
+
+
+def test_fastqEmptyRead(monkeypatch):
+    for size in [1, 3, 8, 20, 1 << 20]:
+        monkeypatch.setattr(readStream, "batchSize", size)
+        for chunks in [readStream.bufferChunks(emptyRead),
+                       readStream.streamChunks(io.BytesIO(emptyRead))]:
+            reads = [read for batch, offset in readStream.fastqBatches(chunks)
+                     for read in batch]
+            assert reads == [b"ACGTACGT", b"", b"GGGTTT"]
@@ -0,0 +1,97 @@
+"""
+test_unitigs.py
+
+Description: Checks that the unitigs of deBruijnGraph.compactUnitigs are
+    the contigs of the node by node walk they replaced, in canonical
+    graphs with k-mers that are their own reverse complement too.
+
+Usage: python3 -m pytest test_unitigs.py
+"""
+
+import numpy as np
+from deBruijnGraph import deBruijnGraph, decodeKmer, reverseComplement
+
+
+# walkContigs
+# Purpose: reads the contigs off a graph node by node, following the
+#          single successor of every walk state until a visited node
+# Parameter: graph: a deBruijnGraph without branching nodes
+# Returns: the list of contigs, paths by their first node, then cycles
+# Note: the walk of findContigs before compactUnitigs, except that the
+#       nodes where a path turns into its own reverse complement are
+#       tried before the other nodes of cycles, so that a path between
+#       two of them is not split
+def walkContigs(graph):
+    succ = graph.successors()
+    visited = np.zeros(len(graph.kmers), dtype=bool)
+    order = np.argsort(graph.first, kind="stable")
+    ends = (graph.edges[order] & 15) == 0
+    starts = 2 * order
+    if graph.canonical:
+        starts = starts + np.where(ends, 1, 0)
+        starts = starts[((graph.edges[order] >> 4) == 0) | ends]
+        # the palindromes and the states linked from the same node read
+        # the other way, by (node order, orientation)
+        states = np.arange(len(succ))
+        palin = reverseComplement(graph.kmers, graph.kval) == graph.kmers
+        turns = np.concatenate((2 * np.flatnonzero(palin),
+                                succ[(succ >> 1 == states >> 1) & (succ != states)]))
+        rank = np.argsort(order)
+        turns = turns[np.lexsort((turns & 1, rank[turns >> 1]))]
+        starts = np.concatenate((starts, turns))
+    else:
+        starts = starts[(graph.edges[order] >> 4) == 0]
+
+    def kmer(state):
+        value = graph.kmers[state >> 1]
+        if state & 1:
+            value = reverseComplement(value, graph.kval)
+        return decodeKmer(value, graph.kval)
+
+    contigs = []
+    for state in list(starts) + [2 * idx for idx in order]:
+        if visited[state >> 1]:
+            continue
+        contig = kmer(state)
+        visited[state >> 1] = True
+        while succ[state] >= 0 and not visited[succ[state] >> 1]:
+            state = succ[state]
+            visited[state >> 1] = True
+            contig += kmer(state)[-1]
+        contigs.append(contig)
+    return contigs
+
+
+def revComp(seq):
+    return seq[::-1].translate(str.maketrans("ACGT", "TGCA"))
+
+
+# A read starting with the palindrome GCCGGC, whose unitig comes back
+# along its own reverse complement
+def test_palindromeUnitig():
+    reads = [b"GCCGGCCACCACTGC", b"AACCAACGCAGT", b"CAACGCAGTGGT"]
+    graph = deBruijnGraph(canonical=True)
+    graph.addReads([(reads, 0)], 6)
+    graph.removeBranchingNodes()
+    assert graph.compactUnitigs().contigs(1) == ["AACCAACGCAGTGGTGGCCGGC"]
+    assert walkContigs(graph) == ["AACCAACGCAGTGGTGGCCGGC"]
+
+
+def test_randomUnitigs():
+    rng = np.random.default_rng(0)
+    for trial in range(500):
+        kval = int(rng.choice([2, 4, 5, 6]))
+        genome = rng.integers(0, 4, int(rng.integers(10, 60)))
+        reads = []
+        for _ in range(int(rng.integers(1, 6))):
+            start = int(rng.integers(0, len(genome) - kval + 1))
+            end = int(rng.integers(start + kval, len(genome) + 1))
+            read = "".join("ACGT"[b] for b in genome[start:end])
+            if rng.random() < 0.5:
+                read = revComp(read)
+            reads.append(read.encode("ascii"))
+        for canonical in [False, True]:
+            graph = deBruijnGraph(canonical=canonical)
+            graph.addReads([(reads, 0)], kval)
+            graph.removeBranchingNodes()
+            assert graph.compactUnitigs().contigs(1) == walkContigs(graph)